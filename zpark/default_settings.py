@@ -222,6 +222,20 @@ Configures the format for messages logged by tasks that Celery is executing.
 Eg: a message might be emitted when a new Spark message is sent.
 """
 
+WORKER_TEMPLATE_CACHE_DIR = None
+"""
+The directory where the Celery workers cache the compiled versions of the
+message templates, so that a restarted worker doesn't need to compile them
+again. The directory must exist and be writable by the user the workers run
+as, and should not be writable by any other user.
+
+The default of ``None`` uses a directory for the user in the system's temp
+directory (eg, ``/tmp/_jinja2-cache-<uid>``). Set to ``False`` to disable the
+cache.
+
+.. versionadded:: 1.3.0
+"""
+
 ZABBIX_TLS_CERT_VERIFY = True
 """
 A boolean which controls whether the TLS certificate served by the Zabbix
@@ -231,3 +245,42 @@ this should be set to `False`.
 .. versionadded:: 1.2.0
 """
 
+
+#
+# Celery settings. These use the Celery setting names and may be overridden
+# in app.cfg like any other setting.
+#
+
+CELERY_TASK_SERIALIZER = 'orjson'
+"""
+The serializer used for the messages that queue tasks to the Celery workers.
+The ``orjson`` serializer produces ordinary JSON, it just does so faster than
+the ``json`` serializer.
+
+.. versionadded:: 1.3.0
+"""
+
+CELERY_RESULT_SERIALIZER = 'orjson'
+"""
+The serializer used for task results.
+
+.. versionadded:: 1.3.0
+"""
+
+CELERY_ACCEPT_CONTENT = ['orjson', 'json']
+"""
+The serializers that the Celery workers accept messages in. ``json`` is
+accepted so that tasks queued with the ``json`` serializer can still be
+processed.
+
+.. versionadded:: 1.3.0
+"""
+
+CELERYD_PREFETCH_MULTIPLIER = 1
+"""
+The number of tasks each worker process reserves at a time. Reserving only
+one means a slow report doesn't hold up the tasks queued behind it while other
+worker processes are idle.
+
+.. versionadded:: 1.3.0
+"""
@@ -24,6 +24,38 @@ class ContextualLogFilter(Filter):
         return True
 
 
+class WorkerLogFormatter(logging.Formatter):
+    """
+    Formats the log messages from the task worker layer.
+
+    Messages logged by tasks are formatted using the task log format, which
+    can include the task's name and id. All other messages are formatted
+    using the worker log format. This allows a single handler to emit both
+    kinds of message.
+
+    Args:
+        task_fmt (str): The format for messages logged by tasks.
+        worker_fmt (str): The format for all other messages.
+        task_logger_name (str): The name of the logger that tasks log to.
+
+    """
+
+    def __init__(self, task_fmt, worker_fmt, task_logger_name):
+        import celery.app.log
+
+        super().__init__(worker_fmt)
+        self._task_formatter = celery.app.log.TaskFormatter(task_fmt,
+                                                            use_color=False)
+        self._task_logger_name = task_logger_name
+
+    def format(self, record):
+        if (record.name == self._task_logger_name
+                or record.name == 'celery.task'
+                or record.name.startswith('celery.task.')):
+            return self._task_formatter.format(record)
+        return super().format(record)
+
+
 def setup_api_logging(app):
     """
     Initialize the log handler(s) which handle log messages from the API
@@ -94,25 +126,24 @@ def setup_celery_logging(app, celery_app, task_logger_name,
 
     """
 
-    import celery.app.log
-
     logconf = {
         'version': 1,
         'formatters': {
-            'taskfmt': {
-                '()': celery.app.log.TaskFormatter,
-                'fmt': app.config.get('WORKER_TASK_LOG_FORMAT',
-                                      celery_app.conf.worker_task_log_format),
-                'use_color': False,
-            },
             'workerfmt': {
-                'format': app.config.get('WORKER_LOG_FORMAT',
-                                         celery_app.conf.worker_log_format),
+                '()': WorkerLogFormatter,
+                'task_fmt': app.config.get(
+                        'WORKER_TASK_LOG_FORMAT',
+                        celery_app.conf.worker_task_log_format),
+                'worker_fmt': app.config.get(
+                        'WORKER_LOG_FORMAT',
+                        celery_app.conf.worker_log_format),
+                'task_logger_name': task_logger_name,
             },
         },
         'handlers': {
-            # Create copies of the dicts stored in the app config.
-            'taskh': dict(app.config.get('WORKER_LOG_HANDLER', {})),
+            # Create a copy of the dict stored in the app config. Task and
+            # worker messages share this handler; the formatter tells them
+            # apart.
             'workh': dict(app.config.get('WORKER_LOG_HANDLER', {})),
             'nullh': {
                 'level': 'INFO',
@@ -126,7 +157,7 @@ def setup_celery_logging(app, celery_app, task_logger_name,
                 'level': 'DEBUG'
             },
             'celery.task': {
-                'handlers': ['taskh'],
+                'handlers': ['workh'],
                 # this can be turned down via the handler's log level
                 'level': 'DEBUG',
                 'propagate': 0
@@ -144,10 +175,7 @@ def setup_celery_logging(app, celery_app, task_logger_name,
         },
     }
 
-    # Apply the correct formatters to the handlers. User cannot override this.
-    logconf['handlers']['taskh'].update({
-            'formatter': 'taskfmt',
-    })
+    # Apply the correct formatter to the handler. User cannot override this.
     logconf['handlers']['workh'].update({
             'formatter': 'workerfmt',
     })
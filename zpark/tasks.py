@@ -1,17 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
 import datetime as dt
+import hashlib
+import json
+import logging
 import os
 import re
+import threading
+import time
 
+from cachetools import TTLCache
 from celery import Celery
 import celery.signals
 from celery.utils.log import get_task_logger
 from ciscosparkapi import SparkApiError
+from jinja2 import FileSystemBytecodeCache
 from pyzabbix import ZabbixAPIException
+from requests.adapters import HTTPAdapter
 
 from zpark import app, basedir, jinja2, spark_api, zabbix_api
 from zpark import celery as celery_app
 from zpark.log import setup_celery_logging
-from zpark.utils import obj_to_dict
+from zpark.utils import obj_to_dict, zabbix_batch_request
 
 
 __all__ = [
@@ -21,13 +30,125 @@ __all__ = [
 
 logger = get_task_logger(__name__)
 
+# Matches the bot's name in the marked-up version of a group room message.
+_MENTION_RE = re.compile(
+        r'^(<[^>]+>)*<spark-mention[^>]+>([^<]+)</spark-mention>')
+
+# A command may only contain these characters.
+_COMMAND_RE = re.compile(r'[a-zA-Z0-9 ]+')
+
+# Maps a Spark roomId to the dict representation of the room.
+_room_cache = TTLCache(maxsize=512, ttl=3600)
+
+# Maps a Spark personId to the dict representation of the person.
+_person_cache = TTLCache(maxsize=2048, ttl=3600)
+
+# Maps a batch of Zabbix status queries to the status parsed from the
+# server's reply. The counts on the server only change every few minutes so
+# the status is reused for a short time rather than querying the server for
+# every command.
+_zabbix_status_cache = TTLCache(maxsize=64, ttl=20)
+
+# The number of seconds that the last good Zabbix server status is kept to
+# fall back on when the Zabbix server can't be reached. After that, the
+# error is reported rather than a status that may be badly out of date.
+ZABBIX_STATUS_MAX_AGE = 300
+
+# The last good status for each batch of Zabbix status queries, along with
+# the time.monotonic() time it was retrieved. These are kept longer than the
+# entries in the cache above so that a (stale) status is available to fall
+# back on when the Zabbix server can't be reached.
+_zabbix_status_last = TTLCache(maxsize=64, ttl=ZABBIX_STATUS_MAX_AGE)
+
+_zabbix_status_lock = threading.Lock()
+
+# The number of connections kept open to each of the Spark and Zabbix
+# servers by a worker process.
+HTTP_POOL_SIZE = 16
+
+# Runs a Spark API call in the background while a task makes another one.
+# Each worker process creates its own; see start_executor().
+_executor = None
+
+
+class BaseZparkTask(celery_app.Task):
+    """
+    The base class for all Zpark tasks.
+
+    Tasks are automatically retried, with an exponential back off between
+    attempts, when a call to the Spark or Zabbix API raises an exception.
+    The task code doesn't need to catch these exceptions itself unless it
+    has some additional work to do before the retry happens.
+
+    The first retry happens after up to 20 seconds and the delay doubles
+    with each attempt, up to a maximum of 10 minutes. The delay is
+    randomized (jittered) so that tasks which failed at the same time, eg
+    during an API outage, don't all retry at the same time.
+
+    """
+
+    max_retries = 6
+    autoretry_for = (SparkApiError, ZabbixAPIException)
+    retry_backoff = 20
+    retry_backoff_max = 600
+    retry_jitter = True
+
+    def on_retry(self, exc, task_id, args, kwargs, einfo):
+        logger.error('An API call returned an error; the task will be'
+                ' retried: %s: %s', type(exc).__name__, exc)
+
 
 @celery.signals.setup_logging.connect
 def setup_logging(**kwargs):
     setup_celery_logging(app, celery_app, __name__, **kwargs)
 
 
-@celery_app.task(bind=True, default_retry_delay=20, max_retries=3)
+@celery.signals.worker_process_init.connect
+def load_templates(**kwargs):
+    # cache the compiled templates on disk so that restarted workers can
+    # skip compiling them again. this is only done in the workers so that
+    # importing zpark (eg, in the API or the cli) doesn't touch the disk.
+    cache_dir = app.config['WORKER_TEMPLATE_CACHE_DIR']
+    if cache_dir is not False:
+        try:
+            if cache_dir is not None and not os.access(cache_dir,
+                                                       os.W_OK | os.X_OK):
+                raise OSError('directory is missing or not writable')
+            jinja2.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        except (OSError, RuntimeError) as e:
+            logger.warning('Unable to cache compiled templates in %s,'
+                           ' continuing without the cache: %s',
+                           cache_dir or 'the default directory', e)
+
+    # compile all of the templates when the worker starts rather than
+    # during the first task that uses each one
+    for name in jinja2.list_templates():
+        jinja2.get_template(name)
+
+
+@celery.signals.worker_process_init.connect
+def reset_http_pools(**kwargs):
+    # connections opened before the worker process was forked (eg, when
+    # logging in to Zabbix) are shared with the parent process. give each
+    # worker process its own pool of connections to reuse across tasks.
+    sessions = [zabbix_api.session]
+    if spark_api is not None:
+        sessions.append(spark_api._session._req_session)
+    for session in sessions:
+        for prefix in ('http://', 'https://'):
+            session.mount(prefix, HTTPAdapter(pool_connections=HTTP_POOL_SIZE,
+                                              pool_maxsize=HTTP_POOL_SIZE))
+
+
+@celery.signals.worker_process_init.connect
+def start_executor(**kwargs):
+    # threads don't survive the fork that creates a worker process so don't
+    # reuse an executor that was started in the parent process.
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=1)
+
+
+@celery_app.task(bind=True, base=BaseZparkTask)
 def task_dispatch_spark_command(self, webhook_data):
     """
     Parse the incoming webhook data and run the appropriate task to handle
@@ -57,33 +178,41 @@ def task_dispatch_spark_command(self, webhook_data):
     """
 
     payload = webhook_data['data']
-    logger.debug('Dispatching webhook request: id:{} name:"{}" actorId:{}'
-            ' [id:{} roomId:{} personEmail:{}]'
-            .format(webhook_data['id'],
-                    webhook_data['name'],
-                    webhook_data['actorId'],
-                    payload['id'],
-                    payload['roomId'],
-                    payload['personEmail']))
-    try:
-        logger.debug('Querying Spark for message id {}'.format(payload['id']))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Dispatching webhook request: id:%s name:"%s" actorId:%s'
+                     ' [id:%s roomId:%s personEmail:%s]',
+                     webhook_data['id'],
+                     webhook_data['name'],
+                     webhook_data['actorId'],
+                     payload['id'],
+                     payload['roomId'],
+                     payload['personEmail'])
+
+    # a room's details (notably its type) rarely change so avoid asking
+    # Spark for them on every command. when they're not cached, fetch them
+    # at the same time as the message.
+    logger.debug('Querying Spark for message id %s', payload['id'])
+    room_dict = _room_cache.get(payload['roomId'])
+    if room_dict is not None:
         msg = spark_api.messages.get(payload['id'])
-    except SparkApiError as e:
-        err = "The Spark API returned an error: {}".format(e)
-        logger.error(err)
-        self.retry(exc=e)
-
-    try:
-        logger.debug('Querying Spark for room id {}'.format(msg.roomId))
-        room = spark_api.rooms.get(msg.roomId)
-    except SparkApiError as e:
-        err = "The Spark API returned an error: {}".format(e)
-        logger.error(err)
-        self.retry(exc=e)
+    else:
+        msg_future = _get_executor().submit(spark_api.messages.get,
+                                            payload['id'])
+        room_dict = _room_dict(payload['roomId'])
+        msg = msg_future.result()
+
+    # the room is looked up using the webhook data so that it can be fetched
+    # at the same time as the message, but it's the room that Spark says the
+    # message is in that the command is answered in.
+    if msg.roomId != room_dict['id']:
+        logger.info('Message id %s is in room %s rather than room %s given'
+                    ' in the webhook data. Using the message\'s room.',
+                    msg.id, msg.roomId, payload['roomId'])
+        room_dict = _room_dict(msg.roomId)
 
     # strip bot's name from the start of the command if the message was
     # received in a group room (this is an artifact of how Spark works).
-    if room.type == 'group':
+    if room_dict['type'] == 'group':
         # the marked-up version of the message wraps the bot name in
         # <spark-mention> tags which makes it easy for us to find out
         # our own name dynamically. note the limitation with this is that
@@ -91,83 +220,60 @@ def task_dispatch_spark_command(self, webhook_data):
         # the message. testing reveals that spark prefixes the <spark-mention>
         # tag with a <p> tag, so account for that and any additional tags as
         # well.
-        m = (re.match('^(<[^>]+>)*<spark-mention[^>]+>([^<]+)<\/spark-mention>',
-                      msg.html))
+        m = _MENTION_RE.match(msg.html)
         if m is not None:
             bot_name = m.group(2)
             # strip bot name and some delimiting characters from the start
             # of the plain text version of the message. use the plain text
             # version so we don't have to worry about additional markup
             # in the message. what's left will be the bot command.
-            cmd = re.split('^' + bot_name + '[,:;]*\s*', msg.text, 1)[1]
+            cmd = strip_bot_name(msg.text, bot_name)
         else:
-            logger.info('Received a message from {} in group room "{}"'
+            logger.info('Received a message from %s in group room "%s"'
                         ' that did not contain the spark-mention tag.'
                         ' The command is being ignored. Possible Spark'
-                        ' issue?'
-                    .format(msg.personEmail, room.title))
+                        ' issue?',
+                        msg.personEmail, room_dict['title'])
             return False
     # in a 1-on-1 room, we'll just receive the command, no mention
     else:
         cmd = msg.text
 
     if len(cmd) > 79:
-        logger.info('Received a command from {} that is too long:'
-                ' allowed chars: 79, received chars: {}. Ignoring.'
-                .format(payload['personEmail'], len(cmd)))
+        logger.info('Received a command from %s that is too long:'
+                ' allowed chars: 79, received chars: %s. Ignoring.',
+                payload['personEmail'], len(cmd))
         return False
 
     # validate the command looks sane and safe
-    if not re.fullmatch('^[a-zA-Z0-9 ]+$', cmd):
-        logger.info('Received a command from {} with invalid characters in it:'
-                ' "{}"'.format(payload['personEmail'], cmd))
+    if not _COMMAND_RE.fullmatch(cmd):
+        logger.info('Received a command from %s with invalid characters in it:'
+                ' "%s"', payload['personEmail'], cmd)
         return False
 
-    try:
-        logger.debug('Querying Spark for person id {}'
-                .format(webhook_data['actorId']))
-        caller = spark_api.people.get(webhook_data['actorId'])
-    except SparkApiError as e:
-        err = "The Spark API returned an error: {}".format(e)
-        logger.error(err)
-        self.retry(exc=e)
-
-    room_dict = obj_to_dict(room)
-    caller_dict = obj_to_dict(caller)
-
-    dispatch_map = {
-        'hello': (
-            task_say_hello,
-            (room_dict, caller_dict)
-        ),
-        'show issues': (
-            task_report_zabbix_active_issues,
-            (room_dict, caller_dict)
-        ),
-        'show status': (
-            task_report_zabbix_server_status,
-            (room_dict, caller_dict)
-        ),
-    }
-
-    task = dispatch_map.get(cmd.lower(), None)
-    if not task:
-        logger.info('Received an unknown command from {}: "{}"'
-                .format(msg.personEmail, cmd))
+    caller_dict = _person_dict(webhook_data['actorId'])
+
+    task = _DISPATCH.get(cmd.lower())
+    if task is None:
+        logger.info('Received an unknown command from %s: "%s"',
+                msg.personEmail, cmd)
         return False
 
-    asynctask = task[0].apply_async(args=(*task[1],))
-    logger.info('Dispatched command "{}" received from {} to task {}'
-            ' with taskid {}'
-            .format(cmd, msg.personEmail, task[0], asynctask.id))
+    asynctask = task.apply_async(args=(room_dict, caller_dict))
+    logger.info('Dispatched command "%s" received from %s to task %s'
+            ' with taskid %s',
+            cmd, msg.personEmail, task, asynctask.id)
     return True
 
 
-@celery_app.task(bind=True, default_retry_delay=20, max_retries=3)
+@celery_app.task(bind=True, base=BaseZparkTask)
 def task_say_hello(self, room, caller):
     """
     Send the "hello" message to a Spark space.
 
+    The message itself is posted by a :py:func:`task_send_spark_message`
+    task so a Spark API error is retried there, not here.
+
     Args:
         room: A :py:obj:`dict` that identifies the Spark space (room) where
             the output should be sent. Note the identified room can be either
@@ -176,34 +282,21 @@ def task_say_hello(self, room, caller):
             a :py:obj:`ciscosparkapi.Person` object that identifies the Spark
             user that requested this report. See also :py:func:`obj_to_dict`.
 
-    Raises:
-        :py:exc:`ciscosparkapi.SparkApiError`: The
-            Spark API returned an error and despite retrying the API call some
-            number of times, the error persisted.
-
     .. versionadded:: 1.1.0
 
     """
 
-    text = jinja2.get_template('say_hello.txt').render(
-            caller=caller,
-            room=room,
-            zpark_contact_info=app.config['ZPARK_CONTACT_INFO'])
-    markdown = jinja2.get_template('say_hello.md').render(
+    text, markdown = render_message(
+            'say_hello',
             caller=caller,
             room=room,
             zpark_contact_info=app.config['ZPARK_CONTACT_INFO'])
-    try:
-        task_send_spark_message(room, text, markdown)
-        logger.info('Said hello to {} in room "{}"'
-                .format(caller['emails'][0], room['title']))
-    except SparkApiError as e:
-        err = "The Spark API returned an error: {}".format(e)
-        logger.error(err)
-        self.retry(exc=e)
+    task_send_spark_message.apply_async(args=(room, text, markdown))
+    logger.info('Said hello to %s in room "%s"',
+            caller['emails'][0], room['title'])
 
 
-@celery_app.task(bind=True, default_retry_delay=20, max_retries=3)
+@celery_app.task(bind=True, base=BaseZparkTask)
 def task_send_spark_message(self, to, text, md=None):
     """
     Send a message to a Spark destination: either a room or a person.
@@ -239,24 +332,26 @@ def task_send_spark_message(self, to, text, md=None):
     if md is not None:
         msg.update(markdown=md)
 
-    try:
-        msg = spark_api.messages.create(**msg)
+    msg = spark_api.messages.create(**msg)
 
-        logger.debug("New Spark message created: toPersonEmail:{} "
-                     "roomId:{} messageId:{}"
-                         .format(msg.toPersonEmail, msg.roomId, msg.id))
-        return msg.id
-    except SparkApiError as e:
-        err = "The Spark API returned an error: {}".format(e)
-        logger.error(err)
-        self.retry(exc=e)
+    logger.debug("New Spark message created: toPersonEmail:%s "
+                 "roomId:%s messageId:%s",
+                 msg.toPersonEmail, msg.roomId, msg.id)
+    return msg.id
 
 
-@celery_app.task(bind=True, default_retry_delay=15, max_retries=3)
+# The report tasks are only acknowledged once they've finished so that a
+# report is not lost if the worker running it dies.
+@celery_app.task(bind=True, base=BaseZparkTask, acks_late=True,
+                 reject_on_worker_lost=True)
 def task_report_zabbix_active_issues(self, room, caller, limit=10):
     """
     Output a list of active Zabbix issues to a Spark space.
 
+    This task only queries Zabbix and renders the list. Posting the list to
+    the space is queued as a :py:func:`task_send_spark_message` task, which
+    deals with any Spark API errors itself.
+
     Args:
         room: A :py:obj:`dict` that identifies the Spark space (room) where
             the output should be sent. Note the identified room can be either
@@ -268,9 +363,6 @@ def task_report_zabbix_active_issues(self, room, caller, limit=10):
             include in the output.
 
     Raises:
-        :py:exc:`ciscosparkapi.SparkApiError`: The
-            Spark API returned an error and despite retrying the API call some
-            number of times, the error persisted.
         :py:exc:`pyzabbix.ZabbixAPIException`: The Zabbix server API returned
             an error and despite retrying the API call some number of times,
             the error persisted.
@@ -278,8 +370,8 @@ def task_report_zabbix_active_issues(self, room, caller, limit=10):
     """
 
     try:
-        logger.debug('Querying Zabbix server at {} for active triggers'
-                .format(app.config['ZABBIX_SERVER_URL']))
+        logger.debug('Querying Zabbix server at %s for active triggers',
+                app.config['ZABBIX_SERVER_URL'])
         triggers = zabbix_api.trigger.get(only_true=1,
                                           skipDependent=1,
                                           monitored=1,
@@ -292,46 +384,39 @@ def task_report_zabbix_active_issues(self, room, caller, limit=10):
                                           selectHosts=['host'],
                                           filter={'value':1},
                                           limit=limit)
-        logger.debug('Retrieved {} trigger(s) from Zabbix'
-                .format(len(triggers)))
+        logger.debug('Retrieved %s trigger(s) from Zabbix', len(triggers))
     except ZabbixAPIException as e:
         notify_of_failed_command(room, caller,
                                  self.request.retries, self.max_retries, e)
-        self.retry(exc=e)
+        raise
 
-    issues = []
-    for t in triggers:
-        issues.append({
-            'host': t['hosts'][0]['host'],
-            'description': t['description'],
-            'lastchangedt': dt.datetime.fromtimestamp(int(t['lastchange']))
-            })
+    fromts = dt.datetime.fromtimestamp
+    issues = [{
+        'host': t['hosts'][0]['host'],
+        'description': t['description'],
+        'lastchangedt': fromts(int(t['lastchange']))
+        } for t in triggers]
 
-    text = jinja2.get_template('report_zabbix_active_issues.txt').render(
+    text, markdown = render_message(
+            'report_zabbix_active_issues',
             issues=issues,
             caller=caller,
             limit=limit,
             room=room)
-    markdown = jinja2.get_template('report_zabbix_active_issues.md').render(
-            issues=issues,
-            caller=caller,
-            limit=limit,
-            room=room)
-    try:
-        task_send_spark_message(room, text, markdown)
-        logger.info('Reported active Zabbix issues to {} room "{}"'
-                .format(room['type'], room['title']))
-    except SparkApiError as e:
-        err = "The Spark API returned an error: {}".format(e)
-        logger.error(err)
-        self.retry(exc=e)
+    task_send_spark_message.apply_async(args=(room, text, markdown))
+    logger.info('Reported active Zabbix issues to %s room "%s"',
+            room['type'], room['title'])
 
 
-@celery_app.task(bind=True, default_retry_delay=15, max_retries=3)
+@celery_app.task(bind=True, base=BaseZparkTask, acks_late=True,
+                 reject_on_worker_lost=True)
 def task_report_zabbix_server_status(self, room, caller):
     """
     Output the Zabbix server status as seen in the web ui dashboard.
 
+    Only the Zabbix queries are retried by this task; once the status has
+    been rendered it's handed off to :py:func:`task_send_spark_message`.
+
     Args:
         room: A :py:obj:`dict` that identifies the Spark space (room) where
             the output should be sent. Note the identified room can be either
@@ -341,107 +426,85 @@ def task_report_zabbix_server_status(self, room, caller):
             user that requested this report. See also :py:func:`obj_to_dict`.
 
     Raises:
-        :py:exc:`ciscosparkapi.SparkApiError`: The
-            Spark API returned an error and despite retrying the API call some
-            number of times, the error persisted.
         :py:exc:`pyzabbix.ZabbixAPIException`: The Zabbix server API returned
             an error and despite retrying the API call some number of times,
             the error persisted.
 
     """
 
-    try:
-        logger.debug('Querying Zabbix server at {} for API version'
-                .format(app.config['ZABBIX_SERVER_URL']))
-        api_ver = [int(n) for n in zabbix_api.api_version().split('.')]
-    except (AttributeError, ZabbixAPIException) as e:
-        notify_of_failed_command(room, caller,
-                                 self.request.retries, self.max_retries, e)
-        self.retry(exc=e)
-
-    stats = {}
-    try:
-        logger.debug('Querying Zabbix server at {} for server status'
-                .format(app.config['ZABBIX_SERVER_URL']))
-
-        stats['enabled_hosts_cnt'] = int(zabbix_api.host.get(
-                countOutput=1,
-                filter={'status':0}))
-        stats['disabled_hosts_cnt'] = int(zabbix_api.host.get(
-                countOutput=1,
-                filter={'status':1}))
-        stats['templates_cnt'] = int(zabbix_api.template.get(countOutput=1))
+    # The queries for all of the dashboard statistics are sent to Zabbix
+    # in a single batch request, along with the query for the API version.
+    stats_queries = (
+        ('enabled_hosts_cnt', 'host.get',
+         dict(countOutput=1, filter={'status':0})),
+        ('disabled_hosts_cnt', 'host.get',
+         dict(countOutput=1, filter={'status':1})),
+        ('templates_cnt', 'template.get',
+         dict(countOutput=1)),
         # The dashboard actually shows items that are enabled, supported and
         # associated with monitored hosts. Zabbix 3.4 also adds the count
-        # of templates to the "enabled items" count.
-        stats['enabled_items_cnt'] = int(zabbix_api.item.get(
-                countOutput=1,
-                monitored=1,
-                filter={'status':0, 'state':0}))
-        if api_ver[0] >= 3 and api_ver[1] >= 4:
-            stats['enabled_items_cnt'] += stats['templates_cnt']
+        # of templates to the "enabled items" count (see below).
+        ('enabled_items_cnt', 'item.get',
+         dict(countOutput=1, monitored=1, filter={'status':0, 'state':0})),
         # The dashboard actually shows items that are disabled, supported
         # or not supported, and that are not associated to templates.
-        stats['disabled_items_cnt'] = int(zabbix_api.item.get(
-                countOutput=1,
-                templated=0,
-                filter={'status':1}))
+        ('disabled_items_cnt', 'item.get',
+         dict(countOutput=1, templated=0, filter={'status':1})),
         # The dashboard actually shows items that are enabled and associated
         # with monitored hosts.
-        stats['notsupported_items_cnt'] = int(zabbix_api.item.get(
-                countOutput=1,
-                monitored=1,
-                filter={'state':1}))
+        ('notsupported_items_cnt', 'item.get',
+         dict(countOutput=1, monitored=1, filter={'state':1})),
         # The dashboard actually shows triggers that are enabled and
         # associated with monitored hosts.
-        stats['enabled_triggers_cnt'] = int(zabbix_api.trigger.get(
-                countOutput=1,
-                monitored=1,
-                filter={'status':0}))
-        stats['disabled_triggers_cnt'] = int(zabbix_api.trigger.get(
-                countOutput=1,
-                filter={'status':1}))
+        ('enabled_triggers_cnt', 'trigger.get',
+         dict(countOutput=1, monitored=1, filter={'status':0})),
+        ('disabled_triggers_cnt', 'trigger.get',
+         dict(countOutput=1, filter={'status':1})),
         # The dashboard actually shows triggers that are enabled and
         # associated with monitored hosts.
-        stats['ok_triggers_cnt'] = int(zabbix_api.trigger.get(
-                countOutput=1,
-                monitored=1,
-                filter={'status':0, 'value':0}))
+        ('ok_triggers_cnt', 'trigger.get',
+         dict(countOutput=1, monitored=1, filter={'status':0, 'value':0})),
         # The dashboard actually shows triggers that are enabled and
         # associated with monitored hosts.
-        stats['problem_triggers_cnt'] = int(zabbix_api.trigger.get(
-                countOutput=1,
-                monitored=1,
-                filter={'status':0, 'value':1}))
-        stats['enabled_httptest_cnt'] = int(zabbix_api.httptest.get(
-                countOutput=1,
-                monitored=1))
-        stats['disabled_httptest_cnt'] = int(zabbix_api.httptest.get(
-                countOutput=1,
-                filter={'status':1}))
+        ('problem_triggers_cnt', 'trigger.get',
+         dict(countOutput=1, monitored=1, filter={'status':0, 'value':1})),
+        ('enabled_httptest_cnt', 'httptest.get',
+         dict(countOutput=1, monitored=1)),
+        ('disabled_httptest_cnt', 'httptest.get',
+         dict(countOutput=1, filter={'status':1})),
+    )
 
+    try:
+        logger.debug('Querying Zabbix server at %s for API version and'
+                ' server status', app.config['ZABBIX_SERVER_URL'])
+        stats, stale_age = get_zabbix_status_cached(
+                [('apiinfo.version', {})]
+                + [(method, params) for _, method, params in stats_queries],
+                lambda results: _parse_zabbix_status(stats_queries, results))
         logger.debug('Retrieved server stats from Zabbix')
     except ZabbixAPIException as e:
         notify_of_failed_command(room, caller,
                                  self.request.retries, self.max_retries, e)
-        self.retry(exc=e)
+        raise
 
-    text = jinja2.get_template('report_zabbix_server_status.txt').render(
-            stats=stats,
-            caller=caller,
-            room=room)
-    markdown = jinja2.get_template('report_zabbix_server_status.md').render(
+    text, markdown = render_message(
+            'report_zabbix_server_status',
             stats=stats,
+            stale_age=stale_age,
             caller=caller,
             room=room)
-    try:
-        task_send_spark_message(room, text, markdown)
-        logger.info('Reported Zabbix server stats to {} room "{}"'
-                .format(room['type'], room['title']))
-    except SparkApiError as e:
-        err = "The Spark API returned an error: {}".format(e)
-        logger.error(err)
-        self.retry(exc=e)
+    task_send_spark_message.apply_async(args=(room, text, markdown))
+    logger.info('Reported Zabbix server stats to %s room "%s"',
+            room['type'], room['title'])
+
+
+# Maps each bot command to the task that handles it. Every task is called
+# with the room the command was sent in and the person who sent it.
+_DISPATCH = {
+    'hello': task_say_hello,
+    'show issues': task_report_zabbix_active_issues,
+    'show status': task_report_zabbix_server_status,
+}
 
 
 def notify_of_failed_command(room, caller, retries, max_retries,
@@ -476,27 +539,24 @@ def notify_of_failed_command(room, caller, retries, max_retries,
     """
 
     logger.error('There was an error responding to a command.'
-            ' Exception: {}'.format(exc))
+            ' Exception: %s', exc)
     if retries == 0:
         # this is the first try
-        text = jinja2.get_template('zpark_command_error.txt').render(
-                caller=caller,
-                room=room,
-                retries=retries)
-        markdown = jinja2.get_template('zpark_command_error.md').render(
+        text, markdown = render_message(
+                'zpark_command_error',
                 caller=caller,
                 room=room,
                 retries=retries)
         try:
             task_send_spark_message.apply(args=(room, text, markdown))
-            logger.info('Notified {} room "{}" that a command'
-                        ' could not be answered'
-                    .format(room['type'], room['title']))
+            logger.info('Notified %s room "%s" that a command'
+                        ' could not be answered',
+                        room['type'], room['title'])
         except SparkApiError as e:
-            logger.error('Unable to notify {} room "{}" that a'
+            logger.error('Unable to notify %s room "%s" that a'
                          ' command could not be answered:'
-                         ' Spark API Error: {}'
-                    .format(room['type'], room['title'], e))
+                         ' Spark API Error: %s',
+                         room['type'], room['title'], e)
             raise
     elif retries > max_retries:
         # Since this is an unintuitively valid condition in which this
@@ -504,3 +564,172 @@ def notify_of_failed_command(room, caller, retries, max_retries,
         # while it's a valid condition, no actions are taken.
         pass
 
+
+def render_message(name, **context):
+    """
+    Render the plain text and markdown versions of a message.
+
+    Each message has a pair of templates, ``<name>.txt`` and ``<name>.md``,
+    which are rendered with the same context.
+
+    Args:
+        name (str): The name of the templates without the file extension.
+        **context: The variables to pass to the templates.
+
+    Returns:
+        tuple: The rendered text and markdown, in that order.
+
+    """
+
+    return (jinja2.get_template(name + '.txt').render(context),
+            jinja2.get_template(name + '.md').render(context))
+
+
+def strip_bot_name(text, bot_name):
+    """
+    Strip the bot's name from the start of a message.
+
+    Messages sent to the bot in a group room start with the bot's name,
+    optionally followed by delimiting punctuation (``,``, ``:`` or ``;``)
+    and whitespace. All of these are removed, leaving just the command.
+
+    Args:
+        text (str): The plain text of the message.
+        bot_name (str): The bot's name as it was mentioned in the message.
+
+    Returns:
+        str: The text with the bot's name and any delimiters removed. If the
+        text does not start with the bot's name, it is returned unchanged.
+
+    """
+
+    if not text.startswith(bot_name):
+        return text
+    return text[len(bot_name):].lstrip(',:;').lstrip()
+
+
+def get_zabbix_status_cached(calls, parse):
+    """
+    Send a batch of Zabbix API status queries, reusing a recent reply to
+    the same batch when there is one.
+
+    The reply is passed to ``parse`` and it's the parsed status that is
+    cached, so a reply that ``parse`` rejects is never reused.
+
+    If the Zabbix server can't be reached, returns an error, or returns a
+    reply that ``parse`` rejects, the last good status is returned instead
+    as long as it's no more than :py:data:`ZABBIX_STATUS_MAX_AGE` seconds
+    old. Otherwise the error is raised.
+
+    Args:
+        calls: A sequence of ``(method, params)`` tuples. See
+            :py:func:`zpark.utils.zabbix_batch_request`.
+        parse: A function that takes the list of results, in the same order
+            as ``calls``, and returns the status. It must raise
+            :py:exc:`pyzabbix.ZabbixAPIException` if the results don't make
+            sense.
+
+    Returns:
+        tuple: The status returned by ``parse`` and the age of the status in
+        seconds if it's the last good status that's being fallen back on.
+        The age is :py:obj:`None` when the status is current.
+
+    Raises:
+        :py:exc:`pyzabbix.ZabbixAPIException`: The Zabbix server could not
+            be reached or returned an error and there was no recent enough
+            status to fall back on.
+
+    """
+
+    key = hashlib.sha256(
+            json.dumps([zabbix_api.url, calls], sort_keys=True)
+            .encode('utf-8')).hexdigest()
+
+    with _zabbix_status_lock:
+        status = _zabbix_status_cache.get(key)
+    if status is not None:
+        return status, None
+
+    try:
+        status = parse(zabbix_batch_request(zabbix_api, calls))
+    except ZabbixAPIException as e:
+        with _zabbix_status_lock:
+            last = _zabbix_status_last.get(key)
+        if last is None:
+            raise
+        retrieved, status = last
+        age = int(time.monotonic() - retrieved)
+        logger.warning('Unable to get the Zabbix server status, reporting'
+                       ' the last known status from %s seconds ago instead:'
+                       ' %s',
+                       age, e)
+        return status, age
+
+    with _zabbix_status_lock:
+        _zabbix_status_cache[key] = status
+        _zabbix_status_last[key] = (time.monotonic(), status)
+    return status, None
+
+
+def _parse_zabbix_status(stats_queries, results):
+    # the dashboard statistics from the reply to the batch of status queries
+    # sent by task_report_zabbix_server_status. the first result is the API
+    # version and the rest are the counts, in the same order as the queries.
+    api_ver = _parse_zabbix_version(results[0])
+    try:
+        stats = {stat: int(result) for (stat, _, _), result
+                 in zip(stats_queries, results[1:])}
+    except (TypeError, ValueError):
+        raise ZabbixAPIException(
+                'Zabbix API returned invalid counts: {!r}'.format(results[1:]))
+
+    if api_ver[0] >= 3 and api_ver[1] >= 4:
+        stats['enabled_items_cnt'] += stats['templates_cnt']
+    return stats
+
+
+def _parse_zabbix_version(version):
+    # the Zabbix API version as a list of ints, eg [3, 4, 0]. a reply that
+    # isn't a version is treated the same as an error from the API.
+    try:
+        api_ver = [int(n) for n in version.split('.')]
+    except (AttributeError, ValueError):
+        api_ver = []
+    if len(api_ver) < 2:
+        raise ZabbixAPIException(
+                'Zabbix API returned an invalid version: {!r}'.format(version))
+    return api_ver
+
+
+def _get_executor():
+    # outside of a worker process (eg, when tasks are run eagerly) the
+    # executor is created the first time it's needed
+    if _executor is None:
+        start_executor()
+    return _executor
+
+
+def _room_dict(room_id):
+    # the dict representation of a Spark room, looked up in the room cache
+    # before asking Spark
+    try:
+        return _room_cache[room_id]
+    except KeyError:
+        pass
+    logger.debug('Querying Spark for room id %s', room_id)
+    room_dict = obj_to_dict(spark_api.rooms.get(room_id))
+    _room_cache[room_id] = room_dict
+    return room_dict
+
+
+def _person_dict(person_id):
+    # the dict representation of a Spark person. like rooms, the people that
+    # send commands are a small set that rarely change.
+    try:
+        return _person_cache[person_id]
+    except KeyError:
+        pass
+    logger.debug('Querying Spark for person id %s', person_id)
+    person_dict = obj_to_dict(spark_api.people.get(person_id))
+    _person_cache[person_id] = person_dict
+    return person_dict
@@ -1,23 +1,138 @@
 from collections import namedtuple
-import json
+from contextlib import ExitStack
+import logging
+import os
+import sys
+import tempfile
+import time
 import unittest
-from unittest.mock import MagicMock, PropertyMock, patch
+from unittest.mock import ANY, MagicMock, Mock, patch
 
 from celery.exceptions import Retry
 from ciscosparkapi import SparkApiError
 from flask import url_for
 from flask_testing import TestCase
+import orjson
 from pyzabbix import ZabbixAPIException
+import requests
 
 import zpark
-from zpark.utils import obj_to_dict
+import zpark.log
+from zpark.utils import obj_to_dict, zabbix_batch_request
+
+
+# Set ZPARK_TEST_DEBUG in the environment to see the debug log messages
+# emitted while the tests run.
+if os.getenv('ZPARK_TEST_DEBUG'):
+    logging.basicConfig(
+            level=logging.DEBUG, stream=sys.stderr,
+            format='%(levelname)s [%(pathname)s:%(lineno)d] %(message)s')
+
+
+# The alerts sent in the POST /alert tests. The request bodies never change
+# so they're encoded once instead of in every test.
+_ALERT_TO_PERSON = 'joel@zpark.packetmischief'
+_ALERT_TO_ROOM = 'roomid12345'
+_ALERT_SUBJECT = 'This might ruin your day...'
+_ALERT_MESSAGE = 'Your data center is on fire'
+# The alert text that the API sends to Spark
+_ALERT_TEXT = '{}\n\n{}'.format(_ALERT_SUBJECT, _ALERT_MESSAGE)
+_ALERT_BODY_PERSON = orjson.dumps({
+    'to': _ALERT_TO_PERSON,
+    'subject': _ALERT_SUBJECT,
+    'message': _ALERT_MESSAGE
+})
+_ALERT_BODY_ROOM = orjson.dumps({
+    'to': _ALERT_TO_ROOM,
+    'subject': _ALERT_SUBJECT,
+    'message': _ALERT_MESSAGE
+})
+# Alerts that are each missing one field. 'message' is optional so the
+# alert without it is still a valid one.
+_ALERT_BODY_MISSING_TO = orjson.dumps({
+    'subject': 'subj',
+    'message': 'mess'
+})
+_ALERT_BODY_MISSING_SUBJECT = orjson.dumps({
+    'to': 'joel',
+    'message': 'mess'
+})
+_ALERT_BODY_MISSING_MESSAGE = orjson.dumps({
+    'to': 'joel',
+    'subject': 'subj'
+})
+
+
+# The webhook that Spark POSTs when a message is created in a room. The
+# build_fake_X functions in BaseTestCase return data that matches it.
+_FAKE_WEBHOOK_JSON = b"""{
+  "id":"Y2lzY29zcGFyazovL3VzL1dFQkhPT0svZjRlNjA1NjAtNjYwMi00ZmIwLWEyNWEtOTQ5ODgxNjA5NDk3",
+  "name":"Zpark UT test webhook",
+  "resource":"messages",
+  "event":"created",
+  "orgId": "Y2lzY29zcGFyazovL3VzL09SR0FOSVpBVElPTi8xZWI2NWZkZi05NjQzLTQxN2YtOTk3NC1hZDcyY2FlMGUxMGY",
+  "createdBy": "Y2lzY29zcGFyazovL3VzL1BFT1BMRS8xZjdkZTVjYi04NTYxLTQ2NzEtYmMwMy1iYzk3NDMxNDQ0MmQ",
+  "appId": "Y2lzY29zcGFyazovL3VzL0FQUExJQ0FUSU9OL0MyNzljYjMwYzAyOTE4MGJiNGJkYWViYjA2MWI3OTY1Y2RhMzliNjAyOTdjODUwM2YyNjZhYmY2NmM5OTllYzFm",
+  "ownedBy": "Joel",
+  "status": "active",
+  "actorId": "personid12345",
+  "data":{
+    "id":"msgid12345",
+    "roomId":"roomid12345",
+    "personId":"personid12345",
+    "personEmail":"joel@zpark.packetmischief",
+    "created":"2015-12-04T17:33:56.767Z"
+  }
+}"""
+
+
+# The types of the fake Spark objects that the build_fake_X and
+# build_spark_api_reply functions return. Creating a namedtuple type is
+# relatively slow so they're only created once.
+_FakeMsg = namedtuple('msg',
+                      'id roomId roomType text personId personEmail html')
+_FakeRoom = namedtuple('room', 'id title type')
+_FakePerson = namedtuple('person', 'id name emails displayName nickName')
+_FakeSparkReply = namedtuple('sparkmsg',
+                             'toPersonEmail roomId text id created')
+
+
+# Autospec'd mocks shared between tests, keyed by patch target. Building
+# an autospec inspects the target which makes it the most expensive part of
+# setting up a test, so it's only done the first time a target is patched.
+_autospecs = {}
+
+
+def patch_autospec(target):
+    """
+    Return a patcher that replaces ``target`` with a shared autospec'd mock.
+
+    The mock is reset before it's handed out so that calls, return values
+    and side effects don't carry over from one test to the next.
+    """
+
+    mock = _autospecs.get(target)
+    if mock is None:
+        patcher = patch(target, autospec=True)
+        mock = _autospecs[target] = patcher.start()
+        patcher.stop()
+    mock.reset_mock()
+    # The tests only set attributes on return values so a plain Mock does;
+    # a MagicMock is several times slower to create.
+    mock.return_value = Mock()
+    mock.side_effect = None
+    return patch(target, new=mock)
 
 
 class BaseTestCase(TestCase):
 
     ZABBIX_VERSION = '3.4.0'
 
-    def create_app(self):
+    @classmethod
+    def setUpClass(cls):
+        # The app is configured once per class rather than before every
+        # test. Tests that change any of these settings must put them back.
+        super(BaseTestCase, cls).setUpClass()
         zpark.app.config.update(
             DEBUG = False,
             TESTING = True,
@@ -29,11 +144,18 @@ class BaseTestCase(TestCase):
             del zpark.app.config['SPARK_WEBHOOK_SECRET']
         except KeyError:
             pass
+        zpark.app.logger.setLevel(999)
+        cls.sb_api_token = ('Token', zpark.app.config['ZPARK_API_TOKEN'])
+        # The API endpoints' URLs don't change from test to test.
+        with zpark.app.test_request_context():
+            cls.URL_ALERT = url_for('api_v1.alert')
+            cls.URL_PING = url_for('api_v1.ping')
+            cls.URL_WEBHOOK = url_for('api_v1.webhook')
+
+    def create_app(self):
         return zpark.app
 
     def setUp(self):
-        self.sb_api_token = ('Token', zpark.app.config['ZPARK_API_TOKEN'])
-        zpark.app.logger.setLevel(999)
         # disable authorization
         zpark.app.config['SPARK_TRUSTED_USERS'] = []
 
@@ -44,30 +166,15 @@ class BaseTestCase(TestCase):
     # data they return are all consistent with each other (same roomIds, for
     # example).
     def build_fake_webhook_json(self):
-        return """{
-  "id":"Y2lzY29zcGFyazovL3VzL1dFQkhPT0svZjRlNjA1NjAtNjYwMi00ZmIwLWEyNWEtOTQ5ODgxNjA5NDk3",
-  "name":"Zpark UT test webhook",
-  "resource":"messages",
-  "event":"created",
-  "orgId": "Y2lzY29zcGFyazovL3VzL09SR0FOSVpBVElPTi8xZWI2NWZkZi05NjQzLTQxN2YtOTk3NC1hZDcyY2FlMGUxMGY",
-  "createdBy": "Y2lzY29zcGFyazovL3VzL1BFT1BMRS8xZjdkZTVjYi04NTYxLTQ2NzEtYmMwMy1iYzk3NDMxNDQ0MmQ",
-  "appId": "Y2lzY29zcGFyazovL3VzL0FQUExJQ0FUSU9OL0MyNzljYjMwYzAyOTE4MGJiNGJkYWViYjA2MWI3OTY1Y2RhMzliNjAyOTdjODUwM2YyNjZhYmY2NmM5OTllYzFm",
-  "ownedBy": "Joel",
-  "status": "active",
-  "actorId": "personid12345",
-  "data":{
-    "id":"msgid12345",
-    "roomId":"roomid12345",
-    "personId":"personid12345",
-    "personEmail":"joel@zpark.packetmischief",
-    "created":"2015-12-04T17:33:56.767Z"
-  }
-}"""
+        return _FAKE_WEBHOOK_JSON
+
+    def build_fake_webhook_dict(self):
+        # Tests modify the dict they get back so each call needs a new one.
+        # Parsing the JSON with orjson is quicker than copy.deepcopy().
+        return orjson.loads(_FAKE_WEBHOOK_JSON)
 
     def build_fake_webhook_msg_tuple(self, text=None, html=None):
-        t = namedtuple('msg', 'id roomId roomType text personId personEmail \
-                       html')
-        return t(
+        return _FakeMsg(
             id='msgid12345',
             roomId='roomid12345',
             roomType='group',
@@ -78,8 +185,7 @@ class BaseTestCase(TestCase):
         )
 
     def build_fake_room_tuple(self, roomType=None):
-        t = namedtuple('room', 'id title type')
-        room = t(
+        room = _FakeRoom(
             id='roomid12345',
             title='Zpark UT',
             type=roomType or 'group'
@@ -87,8 +193,7 @@ class BaseTestCase(TestCase):
         return room
 
     def build_fake_person_tuple(self):
-        t = namedtuple('person', 'id name emails displayName nickName')
-        person = t(
+        person = _FakePerson(
             id='personid12345',
             name='Charlie Root',
             emails=['croot@unix'],
@@ -107,9 +212,8 @@ class BaseTestCase(TestCase):
 class ApiTestCase(BaseTestCase):
 
     def setUp(self):
-        self.mock_sendmsg_patcher = \
-                patch('zpark.tasks.task_send_spark_message.apply_async',
-                      autospec=True)
+        self.mock_sendmsg_patcher = patch_autospec(
+                'zpark.tasks.task_send_spark_message.apply_async')
         self.mock_sendmsg = self.mock_sendmsg_patcher.start()
         super(ApiTestCase, self).setUp()
 
@@ -136,7 +240,7 @@ class ApiV1TestCase(ApiTestCase):
         """
 
         # no auth token here...
-        r = self.client.get(url_for('api_v1.ping'))
+        r = self.client.get(self.URL_PING)
 
         self.assert_401(r)
 
@@ -150,71 +254,53 @@ class ApiV1TestCase(ApiTestCase):
         """
 
         zpark.app.config['ZPARK_API_TOKEN'] = None
+        self.addCleanup(zpark.app.config.__setitem__, 'ZPARK_API_TOKEN',
+                        self.sb_api_token[1])
 
-        r = self.client.get(url_for('api_v1.ping'),
+        r = self.client.get(self.URL_PING,
                              headers=[self.sb_api_token])
 
-        zpark.app.config['ZPARK_API_TOKEN'] = self.sb_api_token
-
         self.assert_500(r)
 
     ### GET /alert endpoint
     def test_alert_get_w_token(self):
-        r = self.client.get(url_for('api_v1.alert'),
+        r = self.client.get(self.URL_ALERT,
                             headers=[self.sb_api_token])
 
         self.assert_405(r)
 
     def test_alert_get_wo_token(self):
-        r = self.client.get(url_for('api_v1.alert'))
+        r = self.client.get(self.URL_ALERT)
 
         self.assert_405(r)
 
     ### POST /alert endpoint
     def test_alert_post_valid_alert_direct(self):
-        to = u'joel@zpark.packetmischief'
-        subject = u'This might ruin your day...'
-        message = u'Your data center is on fire'
+        self.mock_sendmsg.return_value.id = 'id123abc'
 
-        type(self.mock_sendmsg.return_value).id = PropertyMock(
-                                               return_value='id123abc')
-
-        r = self.client.post(url_for('api_v1.alert'),
+        r = self.client.post(self.URL_ALERT,
                              headers=[self.sb_api_token],
-                             data=json.dumps({
-                                'to': to,
-                                'subject': subject,
-                                'message': message
-                             }),
+                             data=_ALERT_BODY_PERSON,
                              content_type='application/json')
         self.assert_200(r)
         self.mock_sendmsg.assert_called_once()
-        rjson = json.loads(r.data)
-        self.assertEqual(rjson['message'], '{}\n\n{}'.format(subject, message))
-        self.assertEqual(rjson['to'], to)
+        rjson = orjson.loads(r.data)
+        self.assertEqual(rjson['message'], _ALERT_TEXT)
+        self.assertEqual(rjson['to'], _ALERT_TO_PERSON)
         self.assertEqual(rjson['taskid'], 'id123abc')
 
     def test_alert_post_valid_alert_group(self):
-        to = u'roomid1234567'
-        subject = u'This might ruin your day...'
-        message = u'Your data center is on fire'
-
-        type(self.mock_sendmsg.return_value).id = PropertyMock(
-                                            return_value='id123abc')
+        self.mock_sendmsg.return_value.id = 'id123abc'
 
-        r = self.client.post(url_for('api_v1.alert'),
+        r = self.client.post(self.URL_ALERT,
                              headers=[self.sb_api_token],
-                             data=json.dumps({
-                                'to': to,
-                                'subject': subject,
-                                'message': message
-                             }),
+                             data=_ALERT_BODY_ROOM,
                              content_type='application/json')
         self.assert_200(r)
         self.mock_sendmsg.assert_called_once()
-        rjson = json.loads(r.data)
-        self.assertEqual(rjson['message'], '{}\n\n{}'.format(subject, message))
-        self.assertEqual(rjson['to'], to)
+        rjson = orjson.loads(r.data)
+        self.assertEqual(rjson['message'], _ALERT_TEXT)
+        self.assertEqual(rjson['to'], _ALERT_TO_ROOM)
         self.assertEqual(rjson['taskid'], 'id123abc')
 
     def test_alert_through_to_task_direct(self):
@@ -232,10 +318,6 @@ class ApiV1TestCase(ApiTestCase):
             - Spark API creates a new message addressed to an individual
         """
 
-        to = u'joel@zpark.packetmischief'
-        subject = u'This might ruin your day...'
-        message = u'Your data center is on fire'
-
         # disable the patch on task_send_spark_message(); we want the
         # real function to be called
         self.mock_sendmsg_patcher.stop()
@@ -246,21 +328,17 @@ class ApiV1TestCase(ApiTestCase):
 
         # Run the task synchronously for this UT
         zpark.celery.conf.task_always_eager = True
-        r = self.client.post(url_for('api_v1.alert'),
+        r = self.client.post(self.URL_ALERT,
                              headers=[self.sb_api_token],
-                             data=json.dumps({
-                                'to': to,
-                                'subject': subject,
-                                'message': message
-                             }),
+                             data=_ALERT_BODY_PERSON,
                              content_type='application/json')
         zpark.celery.conf.task_always_eager = False
 
         self.assert_200(r)
         self.mock_spark_msg_create.assert_called_once()
-        rjson = json.loads(r.data)
-        self.assertEqual(rjson['message'], '{}\n\n{}'.format(subject, message))
-        self.assertEqual(rjson['to'], to)
+        rjson = orjson.loads(r.data)
+        self.assertEqual(rjson['message'], _ALERT_TEXT)
+        self.assertEqual(rjson['to'], _ALERT_TO_PERSON)
 
         self.mock_spark_msg_create_patcher.stop()
 
@@ -279,10 +357,6 @@ class ApiV1TestCase(ApiTestCase):
             - Spark API creates a new message addressed to a group space
         """
 
-        to = u'roomid12345'
-        subject = u'This might ruin your day...'
-        message = u'Your data center is on fire'
-
         # disable the patch on task_send_spark_message(); we want the
         # real function to be called
         self.mock_sendmsg_patcher.stop()
@@ -293,86 +367,68 @@ class ApiV1TestCase(ApiTestCase):
 
         # Run the task synchronously for this UT
         zpark.celery.conf.task_always_eager = True
-        r = self.client.post(url_for('api_v1.alert'),
+        r = self.client.post(self.URL_ALERT,
                              headers=[self.sb_api_token],
-                             data=json.dumps({
-                                'to': to,
-                                'subject': subject,
-                                'message': message
-                             }),
+                             data=_ALERT_BODY_ROOM,
                              content_type='application/json')
         zpark.celery.conf.task_always_eager = False
 
         self.assert_200(r)
         self.mock_spark_msg_create.assert_called_once()
-        rjson = json.loads(r.data)
-        self.assertEqual(rjson['message'], '{}\n\n{}'.format(subject, message))
-        self.assertEqual(rjson['to'], to)
+        rjson = orjson.loads(r.data)
+        self.assertEqual(rjson['message'], _ALERT_TEXT)
+        self.assertEqual(rjson['to'], _ALERT_TO_ROOM)
 
         self.mock_spark_msg_create_patcher.stop()
 
-    def _alert_post_missing_input(self, input_):
-        r = self.client.post(url_for('api_v1.alert'),
+    def _alert_post_missing_input(self, body):
+        r = self.client.post(self.URL_ALERT,
                              headers=[self.sb_api_token],
-                             data=json.dumps(input_),
+                             data=body,
                              content_type='application/json')
         self.assert_status(r, 400)
         self.assertIn(b'Required', r.data)
 
-    def test_alert_post_missing_to(self):
-        input_ = {
-            # missing 'to'
-            'subject': 'subj',
-            'message': 'mess'
-        }
-
-        self._alert_post_missing_input(input_)
-
-    def test_alert_post_missing_subject(self):
-        input_ = {
-            # missing 'subject'
-            'to': 'joel',
-            'message': 'mess'
+    def test_alert_post_missing_required(self):
+        bodies = {
+            'to': _ALERT_BODY_MISSING_TO,
+            'subject': _ALERT_BODY_MISSING_SUBJECT,
         }
 
-        self._alert_post_missing_input(input_)
+        for missing, body in bodies.items():
+            with self.subTest(missing=missing):
+                self._alert_post_missing_input(body)
 
     def test_alert_post_missing_message(self):
         """
         'message' is allowed to be absent so the result of this test should be
         an HTTP 200 and a good status message returned from the API.
         """
-        input_ = {
-            # missing 'message'
-            'to': 'joel',
-            'subject': 'subj',
-        }
-
-        type(self.mock_sendmsg.return_value).id = PropertyMock(
-                                            return_value='id123abc')
-        r = self.client.post(url_for('api_v1.alert'),
+        self.mock_sendmsg.return_value.id = 'id123abc'
+        r = self.client.post(self.URL_ALERT,
                              headers=[self.sb_api_token],
-                             data=json.dumps(input_),
+                             data=_ALERT_BODY_MISSING_MESSAGE,
                              content_type='application/json')
         self.assert_200(r)
-        rjson = json.loads(r.data)
-        self.assertEqual(rjson['message'], input_['subject'])
+        rjson = orjson.loads(r.data)
+        self.assertEqual(rjson['message'], 'subj')
 
     ### /ping endpoint
     def test_ping_get_wo_token(self):
-        r = self.client.get(url_for('api_v1.ping'))
+        r = self.client.get(self.URL_PING)
 
         self.assert_401(r)
 
     def test_ping_get_w_token(self):
-        r = self.client.get(url_for('api_v1.ping'),
+        r = self.client.get(self.URL_PING,
                             headers=[self.sb_api_token])
 
         self.assert_200(r)
-        self.assertEqual(json.loads(r.data)['apiversion'], zpark.v1.API_VERSION)
+        self.assertEqual(orjson.loads(r.data)['apiversion'],
+                         zpark.v1.API_VERSION)
 
     def test_ping_post_verb(self):
-        r = self.client.post(url_for('api_v1.ping'))
+        r = self.client.post(self.URL_PING)
 
         self.assert_405(r)
 
@@ -391,12 +447,12 @@ class ApiV1TestCase(ApiTestCase):
         json_input = self.build_fake_webhook_json()
         mock_apicommon.return_value = ('{}', 200)
 
-        r = self.client.post(url_for('api_v1.webhook'),
+        r = self.client.post(self.URL_WEBHOOK,
                              data=json_input,
                              content_type='application/json')
         self.assert_200(r)
         mock_apicommon.assert_called_once_with(
-                json.loads(json_input))
+                orjson.loads(json_input))
 
     @patch('zpark.v1.hmac.HMAC.hexdigest')
     @patch('zpark.api_common.handle_spark_webhook')
@@ -416,16 +472,15 @@ class ApiV1TestCase(ApiTestCase):
         mock_digest.return_value = 'thisismydigest'
 
         zpark.app.config['SPARK_WEBHOOK_SECRET'] = 'thisismysecret'
+        self.addCleanup(zpark.app.config.pop, 'SPARK_WEBHOOK_SECRET', None)
 
-        r = self.client.post(url_for('api_v1.webhook'),
+        r = self.client.post(self.URL_WEBHOOK,
                              data=json_input,
                              content_type='application/json',
                              headers={'X-Spark-Signature': 'thisismydigest'})
         self.assert_200(r)
         mock_apicommon.assert_called_once_with(
-                json.loads(json_input))
-
-        del zpark.app.config['SPARK_WEBHOOK_SECRET']
+                orjson.loads(json_input))
 
     @patch('zpark.v1.hmac.HMAC.hexdigest')
     @patch('zpark.api_common.handle_spark_webhook')
@@ -445,16 +500,15 @@ class ApiV1TestCase(ApiTestCase):
         mock_digest.return_value = 'thisismydigest'
 
         zpark.app.config['SPARK_WEBHOOK_SECRET'] = 'thisismysecret'
+        self.addCleanup(zpark.app.config.pop, 'SPARK_WEBHOOK_SECRET', None)
 
         # Do not set the X-Spark-Signature header
-        r = self.client.post(url_for('api_v1.webhook'),
+        r = self.client.post(self.URL_WEBHOOK,
                              data=json_input,
                              content_type='application/json')
         self.assert_403(r)
         self.assertFalse(mock_apicommon.called)
 
-        del zpark.app.config['SPARK_WEBHOOK_SECRET']
-
     @patch('zpark.v1.hmac.HMAC.hexdigest')
     @patch('zpark.api_common.handle_spark_webhook')
     def test_webhook_post_digest_mismatch(self, mock_apicommon, mock_digest):
@@ -471,16 +525,15 @@ class ApiV1TestCase(ApiTestCase):
         mock_digest.return_value = 'thisismydigest'
 
         zpark.app.config['SPARK_WEBHOOK_SECRET'] = 'thisismysecret'
+        self.addCleanup(zpark.app.config.pop, 'SPARK_WEBHOOK_SECRET', None)
 
-        r = self.client.post(url_for('api_v1.webhook'),
+        r = self.client.post(self.URL_WEBHOOK,
                              data=json_input,
                              content_type='application/json',
                              headers={'X-Spark-Signature': 'sparkdigest'})
         self.assert_403(r)
         self.assertFalse(mock_apicommon.called)
 
-        del zpark.app.config['SPARK_WEBHOOK_SECRET']
-
     @patch('zpark.api_common.handle_spark_webhook')
     def test_webhook_post_massive_content_length(self, mock_apicommon):
         """
@@ -496,7 +549,7 @@ class ApiV1TestCase(ApiTestCase):
         json_input = self.build_fake_webhook_json()
         mock_apicommon.return_value = ('{}', 200)
 
-        r = self.client.post(url_for('api_v1.webhook'),
+        r = self.client.post(self.URL_WEBHOOK,
                              # Werkzerg test client won't pass our
                              # content-length if we also pass some data >:|
                              #data=json_input,
@@ -519,7 +572,7 @@ class ApiV1TestCase(ApiTestCase):
         json_input = self.build_fake_webhook_json()
         mock_apicommon.return_value = ('{}', 200)
 
-        r = self.client.post(url_for('api_v1.webhook'),
+        r = self.client.post(self.URL_WEBHOOK,
                              # Werkzerg test client won't pass our
                              # content-length if we also pass some data >:|
                              #data=json_input,
@@ -543,7 +596,7 @@ class ApiV1TestCase(ApiTestCase):
         json_input = self.build_fake_webhook_json()
         mock_apicommon.return_value = ('{}', 200)
 
-        r = self.client.post(url_for('api_v1.webhook'),
+        r = self.client.post(self.URL_WEBHOOK,
                              # Werkzerg test client won't pass our
                              # content-length if we also pass some data >:|
                              #data=json_input,
@@ -567,7 +620,7 @@ class ApiV1TestCase(ApiTestCase):
         json_input = self.build_fake_webhook_json()
         mock_apicommon.return_value = ('{}', 200)
 
-        r = self.client.post(url_for('api_v1.webhook'),
+        r = self.client.post(self.URL_WEBHOOK,
                              # Werkzerg test client won't pass our
                              # content-length if we also pass some data >:|
                              #data=json_input,
@@ -586,15 +639,23 @@ class ApiV1TestCase(ApiTestCase):
             - UUT returns HTTP 405 status code
         """
 
-        r = self.client.get(url_for('api_v1.webhook'))
+        r = self.client.get(self.URL_WEBHOOK)
         self.assert_405(r)
 
 
 class ApiCommonTestCase(ApiTestCase):
 
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook(self, mock_task):
+    def setUp(self):
+        self.mock_task_patcher = patch_autospec(
+                'zpark.tasks.task_dispatch_spark_command.apply_async')
+        self.mock_task = self.mock_task_patcher.start()
+        super(ApiCommonTestCase, self).setUp()
+
+    def tearDown(self):
+        self.mock_task_patcher.stop()
+        super(ApiCommonTestCase, self).tearDown()
+
+    def test_handle_spark_webhook(self):
         """
         Test a successful call to handle_spark_webhook().
 
@@ -608,18 +669,16 @@ class ApiCommonTestCase(ApiTestCase):
             - The task_dispatch_spark_command task (mocked) is called once
         """
 
-        type(mock_task.return_value).id = PropertyMock(return_value='id123abc')
+        self.mock_task.return_value.id = 'id123abc'
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         rv = zpark.api_common.handle_spark_webhook(webhook_data)
 
         self.assertEqual('id123abc', rv[0]['taskid'])
         self.assertEqual(200, rv[1])
-        mock_task.assert_called_once_with((webhook_data,))
+        self.mock_task.assert_called_once_with((webhook_data,))
 
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_fail(self, mock_task):
+    def test_handle_spark_webhook_fail(self):
         """
         Test a call to handle_spark_webhook() where an exception is raised.
 
@@ -633,121 +692,22 @@ class ApiCommonTestCase(ApiTestCase):
             - The task_dispatch_spark_command task (mocked) is called once
         """
 
-        mock_task.side_effect = \
+        self.mock_task.side_effect = \
                 zpark.tasks.task_dispatch_spark_command.OperationalError('error')
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         rv = zpark.api_common.handle_spark_webhook(webhook_data)
 
         return_data = rv[0]
         return_code = rv[1]
-        self.assertEqual('error', list(return_data.keys())[0])
+        self.assertIn('error', return_data)
         self.assertEqual(500, return_code)
-        mock_task.assert_called_once_with((webhook_data,))
-
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_bad_resource(self, mock_task):
-        """
-        Test a call to handle_spark_webhook() where the input data contains
-        an invalid 'resource' attribute.
-
-        Expected behavior:
-            - The UUT returns a sequence with two elements:
-                - A dict that contains an error description
-                - An HTTP status code 400
-            - The task_dispatch_spark_command task (mocked) is not called
-        """
-
-        webhook_data = json.loads(self.build_fake_webhook_json())
-        webhook_data['resource'] = 'rooms'
-        rv = zpark.api_common.handle_spark_webhook(webhook_data)
-
-        return_data = rv[0]
-        return_code = rv[1]
-        self.assertEqual('error', list(return_data.keys())[0])
-        self.assertEqual(400, return_code)
-        self.assertFalse(mock_task.called)
-
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_bad_event(self, mock_task):
-        """
-        Test a call to handle_spark_webhook() where the input data contains
-        an invalid 'event' attribute.
-
-        Expected behavior:
-            - The UUT returns a sequence with two elements:
-                - A dict that contains an error description
-                - An HTTP status code 400
-            - The task_dispatch_spark_command task (mocked) is not called
-        """
-
-        webhook_data = json.loads(self.build_fake_webhook_json())
-        webhook_data['event'] = 'deleted'
-        rv = zpark.api_common.handle_spark_webhook(webhook_data)
-
-        return_data = rv[0]
-        return_code = rv[1]
-        self.assertEqual('error', list(return_data.keys())[0])
-        self.assertEqual(400, return_code)
-        self.assertFalse(mock_task.called)
-
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_bad_resource_and_event(self, mock_task):
-        """
-        Test a call to handle_spark_webhook() where the input data contains
-        an invalid 'resource' and event' attributes.
-
-        Expected behavior:
-            - The UUT returns a sequence with two elements:
-                - A dict that contains an error description
-                - An HTTP status code 400
-            - The task_dispatch_spark_command task (mocked) is not called
-        """
-
-        webhook_data = json.loads(self.build_fake_webhook_json())
-        webhook_data['resource'] = 'rooms'
-        webhook_data['event'] = 'deleted'
-        rv = zpark.api_common.handle_spark_webhook(webhook_data)
-
-        return_data = rv[0]
-        return_code = rv[1]
-        self.assertEqual('error', list(return_data.keys())[0])
-        self.assertEqual(400, return_code)
-        self.assertFalse(mock_task.called)
-
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_missing_resource_elm(self, mock_task):
-        """
-        Test a call to handle_spark_webhook() where the input data is missing
-        the 'resource' element.
-
-        Expected behavior:
-            - The UUT returns a sequence with two elements:
-                - A dict that contains an error description
-                - An HTTP status code 400
-            - The task_dispatch_spark_command task (mocked) is not called
-        """
-
-        webhook_data = json.loads(self.build_fake_webhook_json())
-        del webhook_data['resource']
-        rv = zpark.api_common.handle_spark_webhook(webhook_data)
-
-        return_data = rv[0]
-        return_code = rv[1]
-        self.assertEqual('error', list(return_data.keys())[0])
-        self.assertEqual(400, return_code)
-        self.assertFalse(mock_task.called)
+        self.mock_task.assert_called_once_with((webhook_data,))
 
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_missing_event_elm(self, mock_task):
+    def test_handle_spark_webhook_bad_input(self):
         """
-        Test a call to handle_spark_webhook() where the input data is missing
-        the 'event' element.
+        Test calls to handle_spark_webhook() where the input data has an
+        invalid or missing 'resource' and/or 'event' element.
 
         Expected behavior:
             - The UUT returns a sequence with two elements:
@@ -756,44 +716,32 @@ class ApiCommonTestCase(ApiTestCase):
             - The task_dispatch_spark_command task (mocked) is not called
         """
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
-        del webhook_data['event']
-        rv = zpark.api_common.handle_spark_webhook(webhook_data)
-
-        return_data = rv[0]
-        return_code = rv[1]
-        self.assertEqual('error', list(return_data.keys())[0])
-        self.assertEqual(400, return_code)
-        self.assertFalse(mock_task.called)
-
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_missing_multiple_elms(self, mock_task):
-        """
-        Test a call to handle_spark_webhook() where the input data is missing
-        multiple required elements.
-
-        Expected behavior:
-            - The UUT returns a sequence with two elements:
-                - A dict that contains an error description
-                - An HTTP status code 400
-            - The task_dispatch_spark_command task (mocked) is not called
-        """
+        # Each case is a pair of (elements to change, elements to delete)
+        cases = {
+            'bad_resource': ({'resource': 'rooms'}, ()),
+            'bad_event': ({'event': 'deleted'}, ()),
+            'bad_resource_and_event':
+                ({'resource': 'rooms', 'event': 'deleted'}, ()),
+            'missing_resource_elm': ({}, ('resource',)),
+            'missing_event_elm': ({}, ('event',)),
+            'missing_multiple_elms': ({}, ('resource', 'event')),
+        }
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
-        del webhook_data['resource']
-        del webhook_data['event']
-        rv = zpark.api_common.handle_spark_webhook(webhook_data)
+        for case, (changes, deletions) in cases.items():
+            with self.subTest(case=case):
+                webhook_data = self.build_fake_webhook_dict()
+                webhook_data.update(changes)
+                for elm in deletions:
+                    del webhook_data[elm]
+                rv = zpark.api_common.handle_spark_webhook(webhook_data)
 
-        return_data = rv[0]
-        return_code = rv[1]
-        self.assertEqual('error', list(return_data.keys())[0])
-        self.assertEqual(400, return_code)
-        self.assertFalse(mock_task.called)
+                return_data = rv[0]
+                return_code = rv[1]
+                self.assertIn('error', return_data)
+                self.assertEqual(400, return_code)
+                self.assertFalse(self.mock_task.called)
 
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_good_authz(self, mock_task):
+    def test_handle_spark_webhook_good_authz(self):
         """
         Test the webhook handler's behavior when authorization succeeds.
 
@@ -804,7 +752,7 @@ class ApiCommonTestCase(ApiTestCase):
             - The task_dispatch_spark_command task (mocked) is called
         """
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         self.set_spark_trusted_user('trust@zpark')
         webhook_data['data']['personEmail'] = 'trust@zpark'
 
@@ -812,13 +760,11 @@ class ApiCommonTestCase(ApiTestCase):
 
         return_data = rv[0]
         return_code = rv[1]
-        self.assertEqual('taskid', list(return_data.keys())[0])
+        self.assertIn('taskid', return_data)
         self.assertEqual(200, return_code)
-        mock_task.assert_called_once()
+        self.mock_task.assert_called_once()
 
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_good_authz_at_domain(self, mock_task):
+    def test_handle_spark_webhook_good_authz_at_domain(self):
         """
         Test the webhook handler's behavior when given an '@domain.com' input
 
@@ -829,7 +775,7 @@ class ApiCommonTestCase(ApiTestCase):
             - The task_dispatch_spark_command task (mocked) is called
         """
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         self.set_spark_trusted_user('@zpark.testing')
         webhook_data['data']['personEmail'] = 'trust@zpark.testing'
 
@@ -837,13 +783,11 @@ class ApiCommonTestCase(ApiTestCase):
 
         return_data = rv[0]
         return_code = rv[1]
-        self.assertEqual('taskid', list(return_data.keys())[0])
+        self.assertIn('taskid', return_data)
         self.assertEqual(200, return_code)
-        mock_task.assert_called_once()
+        self.mock_task.assert_called_once()
 
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_fail_authz(self, mock_task):
+    def test_handle_spark_webhook_fail_authz(self):
         """
         Test the webhook handler's behavior when authorization fails.
 
@@ -854,7 +798,7 @@ class ApiCommonTestCase(ApiTestCase):
             - The task_dispatch_spark_command task (mocked) is not called
         """
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         self.set_spark_trusted_user('trust@zpark')
         webhook_data['data']['personEmail'] = 'nottrust@zpark'
 
@@ -862,13 +806,11 @@ class ApiCommonTestCase(ApiTestCase):
 
         return_data = rv[0]
         return_code = rv[1]
-        self.assertEqual('error', list(return_data.keys())[0])
+        self.assertIn('error', return_data)
         self.assertEqual(200, return_code)
-        self.assertFalse(mock_task.called)
+        self.assertFalse(self.mock_task.called)
 
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_authz_disabled(self, mock_task):
+    def test_handle_spark_webhook_authz_disabled(self):
         """
         Test the webhook handler's behavior when authorization is disabled.
 
@@ -882,19 +824,17 @@ class ApiCommonTestCase(ApiTestCase):
             - The task_dispatch_spark_command task (mocked) is called
         """
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         rv = zpark.api_common.handle_spark_webhook(webhook_data)
 
         return_data = rv[0]
         return_code = rv[1]
-        self.assertEqual('taskid', list(return_data.keys())[0])
+        self.assertIn('taskid', return_data)
         self.assertEqual(200, return_code)
-        mock_task.assert_called_once()
+        self.mock_task.assert_called_once()
 
-    @patch('zpark.tasks.task_dispatch_spark_command.apply_async',
-           autospec=True)
-    def test_handle_spark_webhook_authz_defaulted(self, mock_task):
+    def test_handle_spark_webhook_authz_defaulted(self):
         """
         Test the webhook handler's behavior when authorization is defaulted.
 
@@ -906,7 +846,7 @@ class ApiCommonTestCase(ApiTestCase):
                 - An HTTP status code 200
             - The task_dispatch_spark_command task (mocked) is not called
         """
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         self.set_spark_trusted_user(None)
         webhook_data['data']['personEmail'] = 'joel@zpark'
 
@@ -914,9 +854,9 @@ class ApiCommonTestCase(ApiTestCase):
 
         return_data = rv[0]
         return_code = rv[1]
-        self.assertEqual('error', list(return_data.keys())[0])
+        self.assertIn('error', return_data)
         self.assertEqual(200, return_code)
-        self.assertFalse(mock_task.called)
+        self.assertFalse(self.mock_task.called)
 
     def test_authorize_webhook_disabled(self):
         """
@@ -926,7 +866,7 @@ class ApiCommonTestCase(ApiTestCase):
             - UUT returns True
         """
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         rv = zpark.api_common.authorize_webhook(webhook_data)
 
         self.assertTrue(rv)
@@ -942,7 +882,7 @@ class ApiCommonTestCase(ApiTestCase):
 
         self.set_spark_trusted_user('trust@zpark')
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         webhook_data['data']['personEmail'] = 'notrust@zpark'
         rv = zpark.api_common.authorize_webhook(webhook_data)
 
@@ -959,7 +899,7 @@ class ApiCommonTestCase(ApiTestCase):
 
         self.set_spark_trusted_user('trust@zpark')
 
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         webhook_data['data']['personEmail'] = 'trust@zpark'
         rv = zpark.api_common.authorize_webhook(webhook_data)
 
@@ -973,7 +913,7 @@ class ApiCommonTestCase(ApiTestCase):
         Expected behavior:
             - UUT raises KeyError
         """
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
         del webhook_data['data']['personEmail']
 
         with self.assertRaises(KeyError):
@@ -983,77 +923,41 @@ class ApiCommonTestCase(ApiTestCase):
 class TaskTestCase(BaseTestCase):
 
     def setUp(self):
-        self.mock_spark_people_get_patcher = \
-                patch('zpark.spark_api.people.get', autospec=True)
-        self.mock_spark_people_get = self.mock_spark_people_get_patcher.start()
-
-        self.mock_spark_msg_create_patcher = \
-                patch('zpark.spark_api.messages.create', autospec=True)
-        self.mock_spark_msg_create = self.mock_spark_msg_create_patcher.start()
-
-        self.mock_spark_msg_get_patcher = \
-                patch('zpark.spark_api.messages.get', autospec=True)
-        self.mock_spark_msg_get = self.mock_spark_msg_get_patcher.start()
-
-        self.mock_spark_rooms_get_patcher = \
-                patch('zpark.spark_api.rooms.get', autospec=True)
-        self.mock_spark_rooms_get = self.mock_spark_rooms_get_patcher.start()
-
-        self.mock_zabbixapi_patcher = \
-            patch('zpark.pyzabbix.ZabbixAPIObjectClass.__getattr__',
-                  autospec=True)
-        self.mock_zabbixapi = self.mock_zabbixapi_patcher.start()
-
-        self.mock_zabbixapi_version_patcher = \
-            patch('zpark.pyzabbix.ZabbixAPI.api_version',
-                  autospec=True)
-        self.mock_zabbixapi_version = \
-            self.mock_zabbixapi_version_patcher.start()
+        # All of the patches are undone together in tearDown()
+        self._patches = ExitStack()
+
+        self.mock_spark_people_get = self._patches.enter_context(
+                patch_autospec('zpark.spark_api.people.get'))
+        self.mock_spark_msg_create = self._patches.enter_context(
+                patch_autospec('zpark.spark_api.messages.create'))
+        self.mock_spark_msg_get = self._patches.enter_context(
+                patch_autospec('zpark.spark_api.messages.get'))
+        self.mock_spark_rooms_get = self._patches.enter_context(
+                patch_autospec('zpark.spark_api.rooms.get'))
+        self.mock_zabbixapi = self._patches.enter_context(
+                patch_autospec(
+                    'zpark.pyzabbix.ZabbixAPIObjectClass.__getattr__'))
+        self.mock_zabbixapi_version = self._patches.enter_context(
+                patch_autospec('zpark.pyzabbix.ZabbixAPI.api_version'))
         self.mock_zabbixapi_version.return_value = BaseTestCase.ZABBIX_VERSION
+        # Most of the dispatch tests check whether this task was dispatched
+        report = 'zpark.tasks.task_report_zabbix_active_issues.apply_async'
+        self.mock_report_issues = self._patches.enter_context(
+                patch_autospec(report))
 
-        if False:
-            import logging
-            import sys
-            fmt = '%(levelname)s [%(pathname)s:%(lineno)d] %(message)s'
-            logging.basicConfig(level=logging.DEBUG, stream=sys.stderr,
-                                format=fmt)
+        # Don't let Spark lookups cached by one test leak into another.
+        zpark.tasks._room_cache.clear()
+        zpark.tasks._person_cache.clear()
+        zpark.tasks._zabbix_status_cache.clear()
+        zpark.tasks._zabbix_status_last.clear()
 
     def tearDown(self):
-        # Allow an individual test to stop a patch without incurring an
-        # exception during teardown (stopping an already stopped patch
-        # throws an exception).
-        try:
-            self.mock_spark_people_get_patcher.stop()
-        except RuntimeError:
-            pass
-        try:
-            self.mock_spark_msg_create_patcher.stop()
-        except RuntimeError:
-            pass
-        try:
-            self.mock_spark_msg_get_patcher.stop()
-        except RuntimeError:
-            pass
-        try:
-            self.mock_spark_rooms_get_patcher.stop()
-        except RuntimeError:
-            pass
-        try:
-            self.mock_zabbixapi_patcher.stop()
-        except RuntimeError:
-            pass
-        try:
-            self.mock_zabbixapi_version_patcher.stop()
-        except RuntimeError:
-            pass
+        self._patches.close()
 
     def build_spark_api_reply(self, toPersonEmail=None, text=None,
                               roomId=None):
-        my_spark_reply_obj = namedtuple('sparkmsg',
-                                         'toPersonEmail roomId text id'
-                                         ' created')
         # this is only a subset of the data returned by the API
-        my_spark_reply = my_spark_reply_obj(
+        my_spark_reply = _FakeSparkReply(
             created='2017-08-09T00:26:11.937Z',
             id='id123456',
             roomId=roomId or 'roomId1234',
@@ -1063,7 +967,118 @@ class TaskTestCase(BaseTestCase):
 
         return my_spark_reply
 
-    @patch('zpark.tasks.task_send_spark_message')
+    def test_task_serializer(self):
+        """
+        Round trip a set of task arguments through the serializer that
+        Celery is configured to use for task messages.
+
+        Expected behavior:
+            - The decoded arguments are identical to the originals
+        """
+
+        from kombu.serialization import dumps, loads, prepare_accept_content
+
+        # namedtuples carry methods, so build the dicts from their fields
+        task_args = [self.build_fake_room_tuple()._asdict(),
+                     self.build_fake_person_tuple()._asdict(),
+                     _ALERT_MESSAGE]
+
+        content_type, content_encoding, data = dumps(
+                task_args, serializer=zpark.celery.conf.task_serializer)
+        self.assertEqual('application/x-orjson', content_type)
+        self.assertEqual(task_args,
+                         loads(data, content_type, content_encoding,
+                               accept=prepare_accept_content(
+                                   zpark.celery.conf.accept_content)))
+
+    def test_load_templates(self):
+        """
+        Compile the templates as a worker process would when it starts.
+
+        Expected behavior:
+            - No bytecode cache is configured before the worker starts
+            - Every template is in the Jinja2 environment's cache
+            - The compiled templates are cached in the configured directory
+        """
+
+        self.assertIsNone(zpark.jinja2.bytecode_cache)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.addCleanup(setattr, zpark.jinja2, 'bytecode_cache', None)
+        self.addCleanup(zpark.app.config.__setitem__,
+                        'WORKER_TEMPLATE_CACHE_DIR', None)
+        zpark.app.config['WORKER_TEMPLATE_CACHE_DIR'] = cache_dir.name
+        zpark.jinja2.cache.clear()
+
+        zpark.tasks.load_templates()
+
+        self.assertEqual(len(zpark.jinja2.list_templates()),
+                         len(zpark.jinja2.cache))
+        self.assertEqual(len(zpark.jinja2.list_templates()),
+                         len(os.listdir(cache_dir.name)))
+
+    def test_load_templates_bad_cache_dir(self):
+        """
+        Compile the templates as a worker process would when it starts but
+        with a template cache directory that doesn't exist.
+
+        Expected behavior:
+            - No bytecode cache is configured
+            - Every template is in the Jinja2 environment's cache
+        """
+
+        self.addCleanup(zpark.app.config.__setitem__,
+                        'WORKER_TEMPLATE_CACHE_DIR', None)
+        zpark.app.config['WORKER_TEMPLATE_CACHE_DIR'] = '/nonexistent/zpark'
+        zpark.jinja2.cache.clear()
+
+        zpark.tasks.load_templates()
+
+        self.assertIsNone(zpark.jinja2.bytecode_cache)
+        self.assertEqual(len(zpark.jinja2.list_templates()),
+                         len(zpark.jinja2.cache))
+
+    def test_reset_http_pools(self):
+        """
+        Replace the HTTP connection pools as a worker process would when it
+        starts.
+
+        Expected behavior:
+            - The Spark and Zabbix API sessions each get new HTTPS adapters
+              sized to the worker's pool size
+        """
+
+        sessions = (zpark.zabbix_api.session,
+                    zpark.spark_api._session._req_session)
+        old_adapters = [s.get_adapter('https://') for s in sessions]
+
+        zpark.tasks.reset_http_pools()
+
+        for session, old_adapter in zip(sessions, old_adapters):
+            adapter = session.get_adapter('https://')
+            self.assertIsNot(old_adapter, adapter)
+            self.assertEqual(zpark.tasks.HTTP_POOL_SIZE,
+                             adapter._pool_maxsize)
+
+    def test_start_executor(self):
+        """
+        Start the background executor as a worker process would when it
+        starts.
+
+        Expected behavior:
+            - Dispatching a command uses the executor started for the worker
+              process rather than one inherited from the parent process
+        """
+
+        old_executor = zpark.tasks._get_executor()
+
+        zpark.tasks.start_executor()
+
+        self.assertIsNot(old_executor, zpark.tasks._get_executor())
+        self.assertIs(zpark.tasks._executor, zpark.tasks._get_executor())
+        old_executor.shutdown()
+
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
     def test_task_say_hello(self, mock_sendmsg):
         """
         A straightforward test of the "say hello" task.
@@ -1083,7 +1098,7 @@ class TaskTestCase(BaseTestCase):
 
         mock_sendmsg.assert_called_once()
         for call in mock_sendmsg.call_args_list:
-            args, kwargs = call
+            args = call[1]['args']
             # arg0 is the room object
             self.assertEqual(room, args[0])
             # arg1 is the text
@@ -1092,39 +1107,9 @@ class TaskTestCase(BaseTestCase):
             self.assertIn('My caretaker is Bot Owner', args[2])
         self.assertIsNone(rv)
 
-    def test_task_say_hello_retry(self):
-        """
-        A test of the "say hello" task that encounters a Spark API error
-        and must retry.
-
-        Expected behavior:
-            - task_send_spark_message (mock) receives a Spark API error when
-              first called. Second time, it's "successful".
-            - UUT is retried after the first attempt
-        """
-
-        room = obj_to_dict(self.build_fake_room_tuple())
-        caller = obj_to_dict(self.build_fake_person_tuple())
-
-        e = SparkApiError(409)
-
-        self.mock_spark_msg_create.side_effect = [e,
-                                                  self.build_spark_api_reply()]
-        mock_retry = patch('zpark.tasks.task_send_spark_message.retry',
-                           autospec=True)
-        mock_retry_patcher = mock_retry.start()
-        mock_retry_patcher.side_effect = Retry
-
-        with self.assertRaises(Retry):
-            zpark.tasks.task_say_hello(room, caller)
-
-        mock_retry_patcher.assert_called_with(exc=e)
-
-        mock_retry.stop()
-
     def test_task_send_spark_message_direct(self):
         to = obj_to_dict(self.build_fake_person_tuple())
-        message = u'Your data center is on fire'
+        message = _ALERT_MESSAGE
 
         spark_api_reply = self.build_spark_api_reply(toPersonEmail=to,
                                                      text=message)
@@ -1137,7 +1122,7 @@ class TaskTestCase(BaseTestCase):
 
     def test_task_send_spark_message_group(self):
         to = obj_to_dict(self.build_fake_room_tuple())
-        message = u'Your data center is on fire'
+        message = _ALERT_MESSAGE
 
         spark_api_reply = self.build_spark_api_reply(toPersonEmail=to,
                                                      text=message)
@@ -1150,25 +1135,22 @@ class TaskTestCase(BaseTestCase):
 
     def test_task_send_spark_message_retry(self):
         to = obj_to_dict(self.build_fake_person_tuple())
-        message = u'Your data center is on fire'
+        message = _ALERT_MESSAGE
 
         e = SparkApiError(409)
 
         self.mock_spark_msg_create.side_effect = [e,
                                                   self.build_spark_api_reply()]
-        mock_retry = patch('zpark.tasks.task_send_spark_message.retry',
-                           autospec=True)
-        mock_retry_patcher = mock_retry.start()
-        mock_retry_patcher.side_effect = Retry
+        mock_retry = self._patches.enter_context(
+                patch_autospec('zpark.tasks.task_send_spark_message.retry'))
+        mock_retry.side_effect = Retry
 
         with self.assertRaises(Retry):
             zpark.tasks.task_send_spark_message(to, message)
 
-        mock_retry_patcher.assert_called_with(exc=e)
-
-        mock_retry.stop()
+        mock_retry.assert_called_with(exc=e, countdown=ANY)
 
-    @patch('zpark.tasks.task_send_spark_message')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
     def test_task_report_zabbix_active_issues_good(self, mock_sendmsg):
         """
         Report the active Zabbix issues to Spark in response to an assumed
@@ -1200,7 +1182,7 @@ class TaskTestCase(BaseTestCase):
         self.mock_zabbixapi.assert_called_once()
         mock_sendmsg.assert_called_once()
         for call in mock_sendmsg.call_args_list:
-            args, kwargs = call
+            args = call[1]['args']
             # arg0 is the room object
             self.assertEqual(room, args[0])
             # arg1 is the text
@@ -1209,7 +1191,7 @@ class TaskTestCase(BaseTestCase):
             self.assertIn('host.packetmischief', args[2])
         self.assertIsNone(rv)
 
-    @patch('zpark.tasks.task_send_spark_message')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
     def test_task_report_zabbix_active_issues_zero_issues(self, mock_sendmsg):
         """
         Report the active Zabbix issues to Spark in response to an assumed
@@ -1234,7 +1216,7 @@ class TaskTestCase(BaseTestCase):
         self.mock_zabbixapi.assert_called_once()
         mock_sendmsg.assert_called_once()
         for call in mock_sendmsg.call_args_list:
-            args, kwargs = call
+            args = call[1]['args']
             # arg0 is the room object
             self.assertEqual(room, args[0])
             # arg1 is the text
@@ -1243,7 +1225,7 @@ class TaskTestCase(BaseTestCase):
             self.assertIn('no active issues', args[2])
 
     @patch('zpark.tasks.notify_of_failed_command')
-    @patch('zpark.tasks.task_send_spark_message')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
     def test_task_report_zabbix_active_issues_zbx_error(self, mock_sendmsg,
                                                         mock_notify):
         """
@@ -1272,7 +1254,7 @@ class TaskTestCase(BaseTestCase):
         mock_notify.assert_called_once()
 
     @patch('zpark.tasks.notify_of_failed_command')
-    @patch('zpark.tasks.task_send_spark_message')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
     def test_task_report_zabbix_active_issues_retry_zbx_err(self, mock_sendmsg,
                                                             mock_notify):
         """
@@ -1295,66 +1277,34 @@ class TaskTestCase(BaseTestCase):
         e = ZabbixAPIException('error')
         self.mock_zabbixapi.side_effect = [e, None]
 
-        mock_retry = patch('zpark.tasks.task_report_zabbix_active_issues.retry',
-                           autospec=True)
-        mock_retry_patcher = mock_retry.start()
-        mock_retry_patcher.side_effect = Retry
+        mock_retry = self._patches.enter_context(
+                patch_autospec(
+                    'zpark.tasks.task_report_zabbix_active_issues.retry'))
+        mock_retry.side_effect = Retry
 
         with self.assertRaises(Retry):
             zpark.tasks.task_report_zabbix_active_issues(room, caller)
 
-        mock_retry_patcher.assert_called_with(exc=e)
+        mock_retry.assert_called_with(exc=e, countdown=ANY)
         self.mock_zabbixapi.assert_called_once()
         mock_notify.assert_called_once()
 
-        mock_retry.stop()
-
-    @patch('zpark.tasks.task_send_spark_message')
-    def test_task_report_zabbix_active_issues_retry_spark_err(self,
-                                                              mock_sendmsg):
-        """
-        Report the active Zabbix issues to Spark in response to an assumed
-        "show me the issues" command. This test mocks the Spark API to
-        throw an exception on the first query and 'success' on the second.
-
-        Expected behavior:
-            - task_report_zabbix_active_issues() should retry after getting the
-              exception from Zabbix
-            - The retry mock should be called with the Spark exception as an
-              argument
-            - Zabbix API (mock) is called once
-            - Spark API (mock) is called once
-        """
-        report_args = ('roomid123abc',
-                       'direct',
-                       'joel@zpark.packetmischief')
+    def build_zabbix_batch_reply(self, value):
+        # the API version followed by the value of each status metric
+        return [BaseTestCase.ZABBIX_VERSION] + [value] * 12
 
-        e = SparkApiError(409)
-        mock_sendmsg.side_effect = [e, None]
-
-        mock_retry = patch('zpark.tasks.task_report_zabbix_active_issues.retry',
-                           autospec=True)
-        mock_retry_patcher = mock_retry.start()
-        mock_retry_patcher.side_effect = Retry
-
-        with self.assertRaises(Retry):
-            zpark.tasks.task_report_zabbix_active_issues(*report_args)
-
-        mock_retry_patcher.assert_called_with(exc=e)
-        self.mock_zabbixapi.assert_called_once()
-        mock_sendmsg.assert_called_once()
-
-        mock_retry.stop()
-
-    @patch('zpark.tasks.task_send_spark_message')
-    def test_task_report_zabbix_server_status_good(self, mock_sendmsg):
+    @patch('zpark.tasks.zabbix_batch_request', autospec=True)
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
+    def test_task_report_zabbix_server_status_good(self, mock_sendmsg,
+                                                   mock_batch):
         """
         Report the Zabbix server status to Spark in response to an assumed
         "show status" command. This test should be successful and has
         no contrived conditions to cause a failure.
 
         Expected behavior:
-            - Zabbix API (mock) is called N times to get N statistics
+            - Zabbix API (mock) is sent a single batch of queries to get the
+              API version and N statistics
             - Spark API (mock) is called once to output the status message
             - Spark API (mock) was called with certain inputs that match the
               (mocked) Zabbix API output
@@ -1362,46 +1312,49 @@ class TaskTestCase(BaseTestCase):
 
         """
 
-        def zabbix_api_reply(*args, **kwargs):
-            # every status metric will have a value of 13
-            return 13
-
-        self.mock_zabbixapi.return_value = zabbix_api_reply
+        # every status metric will have a value of 13
+        mock_batch.return_value = self.build_zabbix_batch_reply(13)
         room = obj_to_dict(self.build_fake_room_tuple())
         caller = obj_to_dict(self.build_fake_person_tuple())
 
         rv = zpark.tasks.task_report_zabbix_server_status(room, caller)
 
-        self.assertEqual(12, self.mock_zabbixapi.call_count)
+        mock_batch.assert_called_once()
+        args, kwargs = mock_batch.call_args
+        self.assertEqual(13, len(args[1]))
+        self.assertEqual('apiinfo.version', args[1][0][0])
         mock_sendmsg.assert_called_once()
         for call in mock_sendmsg.call_args_list:
-            args, kwargs = call
+            args = call[1]['args']
             # arg0 is the room object
             self.assertEqual(room, args[0])
             # arg1 is the text
             self.assertIn('13 / 13 / 13 (39)', args[1])
             # arg2 is the markdown
             self.assertIn('13 / 13 / 13 (39)', args[2])
+            # the status is current
+            self.assertNotIn('did not return a current status', args[1])
         self.assertIsNone(rv)
 
+    @patch('zpark.tasks.zabbix_batch_request', autospec=True)
     @patch('zpark.tasks.notify_of_failed_command')
-    @patch('zpark.tasks.task_send_spark_message')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
     def test_task_report_zabbix_server_status_zbx_error(self, mock_sendmsg,
-                                                        mock_notify):
+                                                        mock_notify,
+                                                        mock_batch):
         """
         Report the Zabbix server status to Spark in response to an assumed
         "show status" command. This test mocks the Zabbix API to
-        throw an exception when the test attempts to get the first status
-        metric
+        throw an exception when the test sends the batch of status queries.
 
         Expected behavior:
             - task_report_zabbix_server_status() reraises the Zabbix API
               exception
-            - Zabbix API (mock) is called once to get the list of issues
+            - Zabbix API (mock) is sent one batch of queries
             - notify_of_failed_command() (mock) should be called once
         """
 
-        self.mock_zabbixapi.side_effect = ZabbixAPIException('error')
+        mock_batch.side_effect = ZabbixAPIException('error')
 
         room = self.build_fake_room_tuple()
         caller = self.build_fake_person_tuple()
@@ -1411,27 +1364,32 @@ class TaskTestCase(BaseTestCase):
                     room,
                     caller)
 
-        self.mock_zabbixapi.assert_called_once()
+        mock_batch.assert_called_once()
         mock_notify.assert_called_once()
+        mock_sendmsg.assert_not_called()
 
+    @patch('zpark.tasks.zabbix_batch_request', autospec=True)
     @patch('zpark.tasks.notify_of_failed_command')
-    @patch('zpark.tasks.task_send_spark_message')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
     def test_task_report_zabbix_server_status_zbx_error2(self, mock_sendmsg,
-                                                         mock_notify):
+                                                         mock_notify,
+                                                         mock_batch):
         """
         Report the Zabbix server status to Spark in response to an assumed
-        "show status" command. This test mocks the Zabbix api_version API call
-        to throw an exception. This code path depends on retrieving the API
+        "show status" command. This test mocks the Zabbix API to return
+        no API version. This code path depends on retrieving the API
         version to support version-specific behavior.
 
         Expected behavior:
-            - task_report_zabbix_server_status() reraises the Zabbix API
-              exception
-            - Zabbix version API (mock) is called once to get the API version
+            - task_report_zabbix_server_status() raises ZabbixAPIException
+            - Zabbix API (mock) is sent one batch of queries
             - notify_of_failed_command() (mock) should be called once
+            - The task doesn't retry on AttributeError
         """
 
-        self.mock_zabbixapi_version.side_effect = ZabbixAPIException('error')
+        reply = self.build_zabbix_batch_reply(13)
+        reply[0] = None
+        mock_batch.return_value = reply
 
         room = self.build_fake_room_tuple()
         caller = self.build_fake_person_tuple()
@@ -1441,13 +1399,20 @@ class TaskTestCase(BaseTestCase):
                     room,
                     caller)
 
-        self.mock_zabbixapi_version.assert_called_once()
+        mock_batch.assert_called_once()
         mock_notify.assert_called_once()
+        mock_sendmsg.assert_not_called()
+        # only errors from the APIs are retried, not programming errors
+        self.assertNotIn(
+                AttributeError,
+                zpark.tasks.task_report_zabbix_server_status.autoretry_for)
 
+    @patch('zpark.tasks.zabbix_batch_request', autospec=True)
     @patch('zpark.tasks.notify_of_failed_command')
-    @patch('zpark.tasks.task_send_spark_message')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
     def test_task_report_zabbix_server_status_retry_zbx_err(self, mock_sendmsg,
-                                                            mock_notify):
+                                                            mock_notify,
+                                                            mock_batch):
         """
         Report the Zabbix server status to Spark in response to an assumed
         "show status" command. This test mocks the Zabbix API to
@@ -1458,7 +1423,7 @@ class TaskTestCase(BaseTestCase):
               exception from Zabbix
             - The retry mock should be called with the Zabbix exception as an
               argument
-            - Zabbix API (mock) is called once
+            - Zabbix API (mock) is sent one batch of queries
             - notify_of_failed_command() (mock) should be called once
         """
 
@@ -1466,58 +1431,262 @@ class TaskTestCase(BaseTestCase):
         caller = self.build_fake_person_tuple()
 
         e = ZabbixAPIException('error')
-        self.mock_zabbixapi.side_effect = [e, None]
+        mock_batch.side_effect = [e, self.build_zabbix_batch_reply(13)]
 
-        mock_retry = patch('zpark.tasks.task_report_zabbix_server_status.retry',
-                           autospec=True)
-        mock_retry_patcher = mock_retry.start()
-        mock_retry_patcher.side_effect = Retry
+        mock_retry = self._patches.enter_context(
+                patch_autospec(
+                    'zpark.tasks.task_report_zabbix_server_status.retry'))
+        mock_retry.side_effect = Retry
 
         with self.assertRaises(Retry):
             zpark.tasks.task_report_zabbix_server_status(room, caller)
 
-        mock_retry_patcher.assert_called_with(exc=e)
-        self.mock_zabbixapi.assert_called_once()
+        mock_retry.assert_called_with(exc=e, countdown=ANY)
+        mock_batch.assert_called_once()
         mock_notify.assert_called_once()
 
-        mock_retry.stop()
+    @patch('zpark.tasks.zabbix_batch_request', autospec=True)
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
+    def test_task_report_zabbix_server_status_cached(self, mock_sendmsg,
+                                                     mock_batch):
+        """
+        Report the Zabbix server status to Spark twice in quick succession.
 
-    @patch('zpark.tasks.task_send_spark_message')
-    def test_task_report_zabbix_server_status_retry_spark_err(self,
-                                                              mock_sendmsg):
+        Expected behavior:
+            - Zabbix API (mock) is sent one batch of queries; the second
+              report reuses the reply to the first
+            - Spark API (mock) is called twice to output the status message
         """
-        Report the Zabbix server status to Spark in response to an assumed
-        "show status" command. This test mocks the Spark API to
-        throw an exception on the first query and 'success' on the second.
+
+        mock_batch.return_value = self.build_zabbix_batch_reply(13)
+        room = obj_to_dict(self.build_fake_room_tuple())
+        caller = obj_to_dict(self.build_fake_person_tuple())
+
+        zpark.tasks.task_report_zabbix_server_status(room, caller)
+        zpark.tasks.task_report_zabbix_server_status(room, caller)
+
+        mock_batch.assert_called_once()
+        self.assertEqual(2, mock_sendmsg.call_count)
+
+    @patch('zpark.tasks.zabbix_batch_request', autospec=True)
+    @patch('zpark.tasks.notify_of_failed_command')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
+    def test_task_report_zabbix_server_status_stale(self, mock_sendmsg,
+                                                    mock_notify, mock_batch):
+        """
+        Report the Zabbix server status to Spark after the cached status has
+        expired and while the Zabbix API is returning an error.
 
         Expected behavior:
-            - task_report_zabbix_server_status() should retry after getting the
-              exception from Zabbix
-            - The retry mock should be called with the Spark exception as an
-              argument
-            - Zabbix API (mock) is called once
-            - Spark API (mock) is called once
+            - Zabbix API (mock) is sent two batches of queries
+            - The second report contains the last known server status and
+              says that it's stale
+            - notify_of_failed_command() (mock) is not called
         """
 
-        room = self.build_fake_room_tuple()
-        caller = self.build_fake_person_tuple()
+        mock_batch.side_effect = [self.build_zabbix_batch_reply(13),
+                                  ZabbixAPIException('error')]
+        room = obj_to_dict(self.build_fake_room_tuple())
+        caller = obj_to_dict(self.build_fake_person_tuple())
 
-        e = SparkApiError(409)
-        mock_sendmsg.side_effect = [e, None]
+        zpark.tasks.task_report_zabbix_server_status(room, caller)
+        zpark.tasks._zabbix_status_cache.clear()
+        zpark.tasks.task_report_zabbix_server_status(room, caller)
 
-        mock_retry = patch('zpark.tasks.task_report_zabbix_server_status.retry',
-                           autospec=True)
-        mock_retry_patcher = mock_retry.start()
-        mock_retry_patcher.side_effect = Retry
+        self.assertEqual(2, mock_batch.call_count)
+        mock_notify.assert_not_called()
+        self.assertEqual(2, mock_sendmsg.call_count)
+        args = mock_sendmsg.call_args[1]['args']
+        self.assertIn('13 / 13 / 13 (39)', args[1])
+        self.assertIn('did not return a current status', args[1])
+        self.assertIn('did not return a current status', args[2])
 
-        with self.assertRaises(Retry):
+    @patch('zpark.zabbix_api.session')
+    @patch('zpark.tasks.notify_of_failed_command')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
+    def test_task_report_zabbix_server_status_unreachable(self, mock_sendmsg,
+                                                          mock_notify,
+                                                          mock_session):
+        """
+        Report the Zabbix server status to Spark after the cached status has
+        expired and while the Zabbix server can't be connected to.
+
+        Expected behavior:
+            - Zabbix API session (mock) is posted to twice; the second post
+              raises requests.ConnectionError
+            - The second report contains the last known server status and
+              says that it's stale
+            - notify_of_failed_command() (mock) is not called
+        """
+
+        def post(url, data=None, timeout=None):
+            if mock_session.post.call_count > 1:
+                raise requests.ConnectionError('connection refused')
+            return self.build_zabbix_session_reply(
+                    [{'jsonrpc': '2.0', 'id': call['id'],
+                      'result': ('3.4.0' if call['method'] == 'apiinfo.version'
+                                 else '13')}
+                     for call in orjson.loads(data)])
+
+        mock_session.post.side_effect = post
+        room = obj_to_dict(self.build_fake_room_tuple())
+        caller = obj_to_dict(self.build_fake_person_tuple())
+
+        zpark.tasks.task_report_zabbix_server_status(room, caller)
+        zpark.tasks._zabbix_status_cache.clear()
+        zpark.tasks.task_report_zabbix_server_status(room, caller)
+
+        self.assertEqual(2, mock_session.post.call_count)
+        mock_notify.assert_not_called()
+        self.assertEqual(2, mock_sendmsg.call_count)
+        args = mock_sendmsg.call_args[1]['args']
+        self.assertIn('13 / 13 / 13 (39)', args[1])
+        self.assertIn('did not return a current status', args[1])
+        self.assertIn('did not return a current status', args[2])
+
+    @patch('zpark.tasks.zabbix_batch_request', autospec=True)
+    @patch('zpark.tasks.notify_of_failed_command')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
+    def test_task_report_zabbix_server_status_too_stale(self, mock_sendmsg,
+                                                        mock_notify,
+                                                        mock_batch):
+        """
+        Report the Zabbix server status to Spark after the last known status
+        has become too old to fall back on and while the Zabbix API is
+        returning an error.
+
+        Expected behavior:
+            - The second report raises ZabbixAPIException
+            - notify_of_failed_command() (mock) is called once
+            - Spark API (mock) is only called for the first report
+        """
+
+        mock_batch.side_effect = [self.build_zabbix_batch_reply(13),
+                                  ZabbixAPIException('error')]
+        room = obj_to_dict(self.build_fake_room_tuple())
+        caller = obj_to_dict(self.build_fake_person_tuple())
+
+        zpark.tasks.task_report_zabbix_server_status(room, caller)
+        zpark.tasks._zabbix_status_cache.clear()
+        zpark.tasks._zabbix_status_last.expire(
+                time.monotonic() + zpark.tasks.ZABBIX_STATUS_MAX_AGE + 1)
+        with self.assertRaises(ZabbixAPIException):
             zpark.tasks.task_report_zabbix_server_status(room, caller)
 
-        mock_retry_patcher.assert_called_with(exc=e)
-        self.assertEqual(12, self.mock_zabbixapi.call_count)
+        mock_notify.assert_called_once()
         mock_sendmsg.assert_called_once()
 
-        mock_retry.stop()
+    @patch('zpark.tasks.zabbix_batch_request', autospec=True)
+    @patch('zpark.tasks.notify_of_failed_command')
+    @patch('zpark.tasks.task_send_spark_message.apply_async')
+    def test_task_report_zabbix_server_status_bad_reply(self, mock_sendmsg,
+                                                        mock_notify,
+                                                        mock_batch):
+        """
+        Report the Zabbix server status to Spark twice in quick succession
+        where the reply to the first batch of queries is missing the API
+        version.
+
+        Expected behavior:
+            - The first report raises ZabbixAPIException
+            - Zabbix API (mock) is sent two batches of queries; the bad
+              reply is not reused by the second report
+            - The second report contains the status from the good reply
+        """
+
+        bad_reply = self.build_zabbix_batch_reply(13)
+        bad_reply[0] = None
+        mock_batch.side_effect = [bad_reply, self.build_zabbix_batch_reply(13)]
+        room = obj_to_dict(self.build_fake_room_tuple())
+        caller = obj_to_dict(self.build_fake_person_tuple())
+
+        with self.assertRaises(ZabbixAPIException):
+            zpark.tasks.task_report_zabbix_server_status(room, caller)
+        zpark.tasks.task_report_zabbix_server_status(room, caller)
+
+        self.assertEqual(2, mock_batch.call_count)
+        mock_sendmsg.assert_called_once()
+        args = mock_sendmsg.call_args[1]['args']
+        self.assertIn('13 / 13 / 13 (39)', args[1])
+
+    def build_zabbix_session_reply(self, json_reply):
+        reply = MagicMock()
+        reply.json.return_value = json_reply
+        return reply
+
+    @patch('zpark.zabbix_api.session')
+    def test_zabbix_batch_request_good(self, mock_session):
+        """
+        Send a batch of Zabbix API calls and receive the replies out of order.
+
+        Expected behavior:
+            - Zabbix API session (mock) is posted to once
+            - All of the calls are posted with unique ids and only the calls
+              that need it carry the auth token
+            - zabbix_batch_request() returns the results in the same order
+              as the calls
+        """
+
+        def post(url, data=None, timeout=None):
+            batch = orjson.loads(data)
+            return self.build_zabbix_session_reply(
+                    [{'jsonrpc': '2.0', 'result': call['method'],
+                      'id': call['id']} for call in reversed(batch)])
+
+        mock_session.post.side_effect = post
+        calls = [('apiinfo.version', {}),
+                 ('host.get', {'countOutput': 1}),
+                 ('item.get', {'countOutput': 1})]
+
+        rv = zabbix_batch_request(zpark.zabbix_api, calls)
+
+        mock_session.post.assert_called_once()
+        batch = orjson.loads(mock_session.post.call_args[1]['data'])
+        self.assertEqual(3, len({call['id'] for call in batch}))
+        self.assertNotIn('auth', batch[0])
+        self.assertIn('auth', batch[1])
+        self.assertEqual(['apiinfo.version', 'host.get', 'item.get'], rv)
+
+    @patch('zpark.zabbix_api.session')
+    def test_zabbix_batch_request_error(self, mock_session):
+        """
+        Send a batch of Zabbix API calls where one of them returns an error.
+
+        Expected behavior:
+            - zabbix_batch_request() raises ZabbixAPIException
+        """
+
+        def post(url, data=None, timeout=None):
+            first, second = orjson.loads(data)
+            return self.build_zabbix_session_reply([
+                {'jsonrpc': '2.0', 'result': '3', 'id': first['id']},
+                {'jsonrpc': '2.0', 'id': second['id'],
+                 'error': {'code': -32602, 'message': 'Invalid params.'}},
+            ])
+
+        mock_session.post.side_effect = post
+        calls = [('host.get', {'countOutput': 1}),
+                 ('item.get', {'countOutput': 1})]
+
+        with self.assertRaises(ZabbixAPIException):
+            zabbix_batch_request(zpark.zabbix_api, calls)
+
+    @patch('zpark.zabbix_api.session')
+    def test_zabbix_batch_request_unreachable(self, mock_session):
+        """
+        Send a batch of Zabbix API calls while the Zabbix server can't be
+        connected to.
+
+        Expected behavior:
+            - zabbix_batch_request() raises ZabbixAPIException
+        """
+
+        mock_session.post.side_effect = requests.ConnectionError(
+                'connection refused')
+        calls = [('host.get', {'countOutput': 1})]
+
+        with self.assertRaises(ZabbixAPIException):
+            zabbix_batch_request(zpark.zabbix_api, calls)
 
     def test_notify_of_failed_command_first_try(self):
         """
@@ -1542,12 +1711,12 @@ class TaskTestCase(BaseTestCase):
         self.mock_spark_msg_create.assert_called_once()
         self.assertIsNone(rv)
 
-    def test_notify_of_failed_command_2nd_try(self):
+    def test_notify_of_failed_command_retries(self):
         """
         Attempt notification that a bot command could not be answered but
         simulate a case where the notification had to be retried due to some
-        sort of error and this is the second try (1st retry) at sending that
-        notification.
+        sort of error. Covers the second try (1st retry) through the last
+        retry before max_retries is exceeded.
 
         Expected behavior:
             - notify_of_failed_command() should do nothing on the 2nd, 3rd, etc
@@ -1558,39 +1727,16 @@ class TaskTestCase(BaseTestCase):
         room = self.build_fake_room_tuple()
         caller = self.build_fake_person_tuple()
 
-        rv = zpark.tasks.notify_of_failed_command(room,
-                                                  caller,
-                                                  1, # retries
-                                                  3, # max_retries
-                                                  'OhShootException')
-
-        self.assertFalse(self.mock_spark_msg_create.called)
-        self.assertIsNone(rv)
-
-    def test_notify_of_failed_command_max_tries(self):
-        """
-        Attempt notification that a bot command could not be answered but
-        simulate a case where the notification had to be retried due to some
-        sort of error and this is the last retry before max_retries is
-        exceeded.
-
-        Expected behavior:
-            - notify_of_failed_command() currently does nothing under these
-              conditions. No Spark message should be sent.
-            - notify_of_failed_command() returns None
-        """
-        self.mock_spark_msg_create.return_value = self.build_spark_api_reply()
-        room = self.build_fake_room_tuple()
-        caller = self.build_fake_person_tuple()
-
-        rv = zpark.tasks.notify_of_failed_command(room,
-                                                  caller,
-                                                  3, # retries
-                                                  3, # max_retries
-                                                  'OhShootException')
+        for retries in (1, 2, 3):
+            with self.subTest(retries=retries):
+                rv = zpark.tasks.notify_of_failed_command(room,
+                                                          caller,
+                                                          retries,
+                                                          3, # max_retries
+                                                          'OhShootException')
 
-        self.assertFalse(self.mock_spark_msg_create.called)
-        self.assertIsNone(rv)
+                self.assertFalse(self.mock_spark_msg_create.called)
+                self.assertIsNone(rv)
 
     @patch('zpark.tasks.task_send_spark_message.apply')
     def test_notify_of_failed_command_spark_error(self, mock_sendmsg):
@@ -1617,8 +1763,7 @@ class TaskTestCase(BaseTestCase):
                                                  'OhShootException')
         mock_sendmsg.assert_called_once()
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command(self, mock_task):
+    def test_task_dispatch_spark_command(self):
         """
         Test the UUT in a successful, non-contrived scenario.
 
@@ -1637,7 +1782,7 @@ class TaskTestCase(BaseTestCase):
         self.mock_spark_msg_get.return_value = \
                 self.build_fake_webhook_msg_tuple()
         self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
@@ -1645,60 +1790,102 @@ class TaskTestCase(BaseTestCase):
         self.mock_spark_msg_get.assert_called_once()
         self.mock_spark_rooms_get.assert_called_once()
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_unknown(self, mock_task):
+    def test_task_dispatch_spark_command_room_cached(self):
         """
-        Test proper handling of an unknown command.
+        Test the UUT only queries Spark for a room's details the first time
+        it receives a command from that room.
 
         Expected behavior:
-            - UUT returns False
-            - No task is dispatched
+            - UUT will return True both times it is called
+            - Spark API 'messages.get' is called twice
+            - Spark API 'rooms.get' is called once
         """
 
         self.mock_spark_msg_get.return_value = \
-                self.build_fake_webhook_msg_tuple(
-                        text='Zpark sudo make me a sandwich',
-                        html='<p><spark-mention data-object-type=\"person\"'
-                             ' data-object-id=\"13579\">Zpark</spark-mention>'
-                             ' sudo make me a sandwich</p>')
+                self.build_fake_webhook_msg_tuple()
         self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
+
+        self.assertTrue(zpark.tasks.task_dispatch_spark_command(webhook_data))
+        self.assertTrue(zpark.tasks.task_dispatch_spark_command(webhook_data))
+
+        self.assertEqual(2, self.mock_spark_msg_get.call_count)
+        self.mock_spark_rooms_get.assert_called_once()
+
+    def test_task_dispatch_spark_command_room_mismatch(self):
+        """
+        Test the UUT answers a command in the room that Spark says the
+        message is in when the webhook data names a different room.
+
+        Expected behavior:
+            - UUT will return True
+            - Spark API 'rooms.get' is called for both rooms
+            - The command is dispatched with the message's room
+        """
+
+        self.mock_spark_msg_get.return_value = \
+                self.build_fake_webhook_msg_tuple()
+        self.mock_spark_rooms_get.side_effect = lambda room_id: _FakeRoom(
+                id=room_id, title='Zpark UT', type='group')
+        webhook_data = self.build_fake_webhook_dict()
+        webhook_data['data']['roomId'] = 'otherroomid'
 
         rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
-        self.assertFalse(rv)
-        self.assertFalse(mock_task.called)
+        self.assertTrue(rv)
+        self.assertEqual(2, self.mock_spark_rooms_get.call_count)
+        self.mock_spark_rooms_get.assert_called_with('roomid12345')
+        room = self.mock_report_issues.call_args[1]['args'][0]
+        self.assertEqual('roomid12345', room['id'])
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_mixed_case(self, mock_task):
+    def test_task_dispatch_spark_command_person_cached(self):
         """
-        Test the UUT can handle commands that are typed iN mIxED CAse.
+        Test the UUT only queries Spark for a person's details the first time
+        it receives a command from that person.
 
-        Note this test does NOT check that the command was actually
-        dispatched. There are individual tests that check each command
-        is dispatched properly. This test just checks the stuff that leads
-        up to actual dispatch. However, in order for the UUT to run its
-        course, we mock the task that we expect it to run.
+        Expected behavior:
+            - UUT will return True both times it is called
+            - Spark API 'messages.get' is called twice
+            - Spark API 'people.get' is called once
+        """
+
+        self.mock_spark_msg_get.return_value = \
+                self.build_fake_webhook_msg_tuple()
+        self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
+        self.mock_spark_people_get.return_value = \
+                self.build_fake_person_tuple()
+        webhook_data = self.build_fake_webhook_dict()
+
+        self.assertTrue(zpark.tasks.task_dispatch_spark_command(webhook_data))
+        self.assertTrue(zpark.tasks.task_dispatch_spark_command(webhook_data))
+
+        self.assertEqual(2, self.mock_spark_msg_get.call_count)
+        self.mock_spark_people_get.assert_called_once()
+
+    def test_task_dispatch_spark_command_unknown(self):
+        """
+        Test proper handling of an unknown command.
 
         Expected behavior:
-            - UUT will return True
-            - Spark API 'messages.get' is called once
-            - Spark API 'rooms.get' is called once
+            - UUT returns False
+            - No task is dispatched
         """
 
         self.mock_spark_msg_get.return_value = \
-                self.build_fake_webhook_msg_tuple(text='Zpark Show issues')
+                self.build_fake_webhook_msg_tuple(
+                        text='Zpark sudo make me a sandwich',
+                        html='<p><spark-mention data-object-type=\"person\"'
+                             ' data-object-id=\"13579\">Zpark</spark-mention>'
+                             ' sudo make me a sandwich</p>')
         self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
-        self.assertTrue(rv)
-        self.mock_spark_msg_get.assert_called_once()
-        self.mock_spark_rooms_get.assert_called_once()
+        self.assertFalse(rv)
+        self.assertFalse(self.mock_report_issues.called)
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_with_delimiters(self, mock_task):
+    def test_task_dispatch_spark_command_with_delimiters(self):
         """
         Test the UUT can handle commands received in a group room with
         various delimiting characters between the bot name and the command.
@@ -1730,13 +1917,77 @@ class TaskTestCase(BaseTestCase):
                     self.build_fake_webhook_msg_tuple(text=txt, html=html)
             self.mock_spark_rooms_get.return_value = \
                     self.build_fake_room_tuple()
-            webhook_data = json.loads(self.build_fake_webhook_json())
+            webhook_data = self.build_fake_webhook_dict()
 
             rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
             self.assertTrue(rv, "Failed with delim '{}'".format(d))
 
 
+    def test_strip_bot_name(self):
+        """
+        Test stripping the bot's name and delimiters from a message.
+
+        Expected behavior:
+            - The bot name, delimiters and whitespace are removed
+            - Text that doesn't start with the bot name is returned as-is
+        """
+
+        for text in ('Zpark show issues', 'Zpark,show issues',
+                     'Zpark: show issues', 'Zpark;; \tshow issues'):
+            self.assertEqual('show issues',
+                             zpark.tasks.strip_bot_name(text, 'Zpark'),
+                             "Failed with text '{}'".format(text))
+        self.assertEqual('show issues',
+                         zpark.tasks.strip_bot_name('show issues', 'Zpark'))
+        self.assertEqual('show issues',
+                         zpark.tasks.strip_bot_name('Zpark Bot show issues',
+                                                    'Zpark Bot '))
+
+    def test_render_message(self):
+        """
+        Test rendering the text and markdown versions of a message.
+
+        Expected behavior:
+            - Both versions are rendered from the same context
+        """
+
+        room = obj_to_dict(self.build_fake_room_tuple())
+        caller = obj_to_dict(self.build_fake_person_tuple())
+
+        text, markdown = zpark.tasks.render_message(
+                'say_hello', caller=caller, room=room,
+                zpark_contact_info='Bot Owner')
+
+        self.assertIn('My caretaker is Bot Owner', text)
+        self.assertIn('My caretaker is Bot Owner', markdown)
+        self.assertNotEqual(text, markdown)
+
+    def test_worker_log_formatter(self):
+        """
+        Test formatting task and worker log messages with the one worker
+        log formatter.
+
+        Expected behavior:
+            - Messages from the task logger use the task log format
+            - Other messages use the worker log format
+        """
+
+        formatter = zpark.log.WorkerLogFormatter('task: %(message)s',
+                                                 'worker: %(message)s',
+                                                 'zpark.tasks')
+
+        def record(name):
+            return logging.LogRecord(name, logging.INFO, __file__, 1,
+                                     'hello', None, None)
+
+        self.assertEqual('task: hello',
+                         formatter.format(record('zpark.tasks')))
+        self.assertEqual('task: hello',
+                         formatter.format(record('celery.task')))
+        self.assertEqual('worker: hello',
+                         formatter.format(record('celery.worker')))
+
     @patch('zpark.tasks.task_say_hello.apply_async')
     def test_task_dispatch_spark_command_say_hello(self, mock_task):
         """
@@ -1751,7 +2002,7 @@ class TaskTestCase(BaseTestCase):
         self.mock_spark_msg_get.return_value = \
                 self.build_fake_webhook_msg_tuple(text='Zpark hello')
         self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         zpark.tasks.task_dispatch_spark_command(webhook_data)
 
@@ -1760,30 +2011,35 @@ class TaskTestCase(BaseTestCase):
             obj_to_dict(self.mock_spark_people_get.return_value)))
 
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_show_issues(self, mock_task):
+    def test_task_dispatch_spark_command_show_issues(self):
         """
-        Test dispatching of command "show issues"
+        Test dispatching of command "show issues", including when it's typed
+        iN mIxED CAse.
 
         Expected behavior:
+            - UUT will return True
             - The appropriate task is fired asynchronously
         """
 
         self.mock_spark_people_get.return_value = \
                 self.build_fake_person_tuple()
-        self.mock_spark_msg_get.return_value = \
-                self.build_fake_webhook_msg_tuple()
         self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
-        zpark.tasks.task_dispatch_spark_command(webhook_data)
+        for text in ('Zpark show issues', 'Zpark Show issues'):
+            with self.subTest(text=text):
+                self.mock_report_issues.reset_mock()
+                self.mock_spark_msg_get.return_value = \
+                        self.build_fake_webhook_msg_tuple(text=text)
 
-        mock_task.assert_called_once_with(args=(
-            obj_to_dict(self.mock_spark_rooms_get.return_value),
-            obj_to_dict(self.mock_spark_people_get.return_value)))
+                rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
+                self.assertTrue(rv)
+                self.mock_report_issues.assert_called_once_with(args=(
+                    obj_to_dict(self.mock_spark_rooms_get.return_value),
+                    obj_to_dict(self.mock_spark_people_get.return_value)))
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
+    @patch('zpark.tasks.task_report_zabbix_server_status.apply_async')
     def test_task_dispatch_spark_command_show_status(self, mock_task):
         """
         Test dispatching of command "show status"
@@ -1795,18 +2051,18 @@ class TaskTestCase(BaseTestCase):
         self.mock_spark_people_get.return_value = \
                 self.build_fake_person_tuple()
         self.mock_spark_msg_get.return_value = \
-                self.build_fake_webhook_msg_tuple(text='Zpark show issues')
+                self.build_fake_webhook_msg_tuple(text='Zpark show status')
         self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         zpark.tasks.task_dispatch_spark_command(webhook_data)
 
         mock_task.assert_called_once_with(args=(
             obj_to_dict(self.mock_spark_rooms_get.return_value),
             obj_to_dict(self.mock_spark_people_get.return_value)))
+        self.assertFalse(self.mock_report_issues.called)
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_direct(self, mock_task):
+    def test_task_dispatch_spark_command_direct(self):
         """
         Test dispatching of commands received in a 'direct' room.
 
@@ -1825,17 +2081,16 @@ class TaskTestCase(BaseTestCase):
                 self.build_fake_webhook_msg_tuple(text='show issues')
         self.mock_spark_rooms_get.return_value = \
                 self.build_fake_room_tuple(roomType='direct')
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
         self.assertTrue(rv)
-        mock_task.assert_called_once_with(args=(
+        self.mock_report_issues.assert_called_once_with(args=(
             obj_to_dict(self.mock_spark_rooms_get.return_value),
             obj_to_dict(self.mock_spark_people_get.return_value)))
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_group(self, mock_task):
+    def test_task_dispatch_spark_command_group(self):
         """
         Test dispatching of commands received in a 'group' room.
 
@@ -1857,17 +2112,16 @@ class TaskTestCase(BaseTestCase):
                 self.build_fake_webhook_msg_tuple(text='Zpark show issues')
         self.mock_spark_rooms_get.return_value = \
                 self.build_fake_room_tuple(roomType='group')
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
         self.assertTrue(rv)
-        mock_task.assert_called_once_with(args=(
+        self.mock_report_issues.assert_called_once_with(args=(
             obj_to_dict(self.mock_spark_rooms_get.return_value),
             obj_to_dict(self.mock_spark_people_get.return_value)))
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_group_2(self, mock_task):
+    def test_task_dispatch_spark_command_group_2(self):
         """
         Test dispatching of commands received in a 'group' room.
 
@@ -1893,17 +2147,16 @@ class TaskTestCase(BaseTestCase):
                              ' </spark-mention> show issues</p>')
         self.mock_spark_rooms_get.return_value = \
                 self.build_fake_room_tuple(roomType='group')
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
         self.assertTrue(rv)
-        mock_task.assert_called_once_with(args=(
+        self.mock_report_issues.assert_called_once_with(args=(
             obj_to_dict(self.mock_spark_rooms_get.return_value),
             obj_to_dict(self.mock_spark_people_get.return_value)))
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_group_no_mention(self, mock_task):
+    def test_task_dispatch_spark_command_group_no_mention(self):
         """
         Test handling of a group message that does not include a mention
         of the bot's name.
@@ -1924,12 +2177,12 @@ class TaskTestCase(BaseTestCase):
                         # html element is missing the spark-mention tag
                         html='show issues')
         self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
         self.assertFalse(rv)
-        self.assertFalse(mock_task.called)
+        self.assertFalse(self.mock_report_issues.called)
 
     def test_task_dispatch_spark_command_spark_fail_msg(self):
         """
@@ -1943,15 +2196,14 @@ class TaskTestCase(BaseTestCase):
 
         e = SparkApiError(404)
         self.mock_spark_msg_get.side_effect = e
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         with self.assertRaises(SparkApiError):
             zpark.tasks.task_dispatch_spark_command(webhook_data)
 
         self.mock_spark_msg_get.assert_called_once()
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_spark_fail_msg_retry(self, mock_task):
+    def test_task_dispatch_spark_command_spark_fail_msg_retry(self):
         """
         Test the UUT will attempt a retry when it receives a SparkApiError
         when retrieving message details.
@@ -1965,19 +2217,17 @@ class TaskTestCase(BaseTestCase):
 
         e = SparkApiError(409)
         self.mock_spark_msg_get.side_effect = e
-        mock_retry = patch('zpark.tasks.task_dispatch_spark_command.retry',
-                           autospec=True)
-        mock_retry_patcher = mock_retry.start()
-        mock_retry_patcher.side_effect = Retry
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        mock_retry = self._patches.enter_context(
+                patch_autospec(
+                    'zpark.tasks.task_dispatch_spark_command.retry'))
+        mock_retry.side_effect = Retry
+        webhook_data = self.build_fake_webhook_dict()
 
         with self.assertRaises(Retry):
             zpark.tasks.task_dispatch_spark_command.apply(args=(webhook_data,))
 
-        mock_retry_patcher.assert_called_with(exc=e)
-        self.assertFalse(mock_task.called)
-
-        mock_retry.stop()
+        mock_retry.assert_called_with(exc=e, countdown=ANY)
+        self.assertFalse(self.mock_report_issues.called)
 
     def test_task_dispatch_spark_command_spark_fail_room(self):
         """
@@ -1993,16 +2243,14 @@ class TaskTestCase(BaseTestCase):
         self.mock_spark_rooms_get.side_effect = e
         self.mock_spark_msg_get.return_value = \
                 self.build_fake_webhook_msg_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         with self.assertRaises(SparkApiError):
             zpark.tasks.task_dispatch_spark_command(webhook_data)
 
         self.mock_spark_rooms_get.assert_called_once()
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_spark_fail_room_retry(self,
-                                                               mock_task):
+    def test_task_dispatch_spark_command_spark_fail_room_retry(self):
         """
         Test the UUT will attempt a retry when it receives a SparkApiError
         when retrieving room details.
@@ -2018,22 +2266,19 @@ class TaskTestCase(BaseTestCase):
         self.mock_spark_rooms_get.side_effect = e
         self.mock_spark_msg_get.return_value = \
                 self.build_fake_webhook_msg_tuple()
-        mock_retry = patch('zpark.tasks.task_dispatch_spark_command.retry',
-                           autospec=True)
-        mock_retry_patcher = mock_retry.start()
-        mock_retry_patcher.side_effect = Retry
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        mock_retry = self._patches.enter_context(
+                patch_autospec(
+                    'zpark.tasks.task_dispatch_spark_command.retry'))
+        mock_retry.side_effect = Retry
+        webhook_data = self.build_fake_webhook_dict()
 
         with self.assertRaises(Retry):
             zpark.tasks.task_dispatch_spark_command.apply(args=(webhook_data,))
 
-        mock_retry_patcher.assert_called_with(exc=e)
-        self.assertFalse(mock_task.called)
+        mock_retry.assert_called_with(exc=e, countdown=ANY)
+        self.assertFalse(self.mock_report_issues.called)
 
-        mock_retry.stop()
-
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_invalid_chars(self, mock_task):
+    def test_task_dispatch_spark_command_invalid_chars(self):
         """
         Test the UUT will reject commands that are non-alphanumeric.
 
@@ -2052,19 +2297,18 @@ class TaskTestCase(BaseTestCase):
         )
 
         self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         for c in test_cmds:
-            c = 'Zpark ' + c
-            self.mock_spark_msg_get.return_value = \
-                    self.build_fake_webhook_msg_tuple(text=c)
-            rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
+            with self.subTest(cmd=c):
+                self.mock_spark_msg_get.return_value = \
+                        self.build_fake_webhook_msg_tuple(text='Zpark ' + c)
+                rv = zpark.tasks.task_dispatch_spark_command(webhook_data)
 
-            self.assertFalse(rv)
-            self.assertFalse(mock_task.called)
+                self.assertFalse(rv)
+                self.assertFalse(self.mock_report_issues.called)
 
-    @patch('zpark.tasks.task_report_zabbix_active_issues.apply_async')
-    def test_task_dispatch_spark_command_loooong_command(self, mock_task):
+    def test_task_dispatch_spark_command_loooong_command(self):
         """
         Test the UUT will reject commands that are longer than is
         reasonable. The UUT considers "reasonable" to be <= 79 characters.
@@ -2085,7 +2329,7 @@ class TaskTestCase(BaseTestCase):
         test_cmd = 'Zpark show' + ' run' * 25
 
         self.mock_spark_rooms_get.return_value = self.build_fake_room_tuple()
-        webhook_data = json.loads(self.build_fake_webhook_json())
+        webhook_data = self.build_fake_webhook_dict()
 
         self.mock_spark_msg_get.return_value = \
                 self.build_fake_webhook_msg_tuple(text=test_cmd)
@@ -2093,5 +2337,5 @@ class TaskTestCase(BaseTestCase):
 
         self.assertFalse(rv)
         self.assertFalse(self.mock_spark_people_get.called)
-        self.assertFalse(mock_task.called)
+        self.assertFalse(self.mock_report_issues.called)
 
@@ -1,3 +1,8 @@
+import json
+
+from pyzabbix import ZabbixAPIException
+import requests
+
 
 def obj_to_dict(obj):
     """
@@ -22,3 +27,84 @@ def obj_to_dict(obj):
             for attr in dir(obj)
             if not attr.startswith('_')
     }
+
+
+def zabbix_batch_request(zapi, calls):
+    """
+    Send a number of Zabbix API calls to the server in a single JSON-RPC
+    batch request.
+
+    This saves a round trip to the Zabbix server for every call after the
+    first. The calls are authenticated using the token that ``zapi`` got
+    when it logged in.
+
+    Args:
+        zapi (pyzabbix.ZabbixAPI): The Zabbix API object to send the
+            calls through.
+        calls: A sequence of ``(method, params)`` tuples where ``method`` is
+            the name of an API method (eg, ``host.get``) and ``params`` is a
+            :py:obj:`dict` of the parameters to pass to it.
+
+    Returns:
+        list:
+            The result of each call, in the same order as ``calls``.
+
+    Raises:
+        :py:exc:`pyzabbix.ZabbixAPIException`: The Zabbix server could not
+            be reached, returned an HTTP error status, returned an error for
+            any of the calls or returned a reply that could not be
+            understood.
+
+    """
+
+    batch = []
+    for method, params in calls:
+        call = {
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': params or {},
+            'id': zapi.id + len(batch),
+        }
+        # the API version can be requested without authenticating
+        if zapi.auth and method != 'apiinfo.version':
+            call['auth'] = zapi.auth
+        batch.append(call)
+
+    # a server that can't be reached is handled by the caller the same way
+    # as a server that returns an error
+    try:
+        response = zapi.session.post(zapi.url,
+                                     data=json.dumps(batch),
+                                     timeout=zapi.timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise ZabbixAPIException('Unable to send the request to the Zabbix'
+                ' server: {}'.format(e)) from e
+    zapi.id += len(batch)
+
+    try:
+        replies = response.json()
+    except ValueError:
+        raise ZabbixAPIException('Unable to parse json: {}'
+                .format(response.text))
+
+    # a batch that is rejected outright is answered with a single error
+    # rather than a list of replies
+    if isinstance(replies, dict):
+        replies = [replies]
+
+    results = {}
+    for reply in replies:
+        if 'error' in reply:
+            error = reply['error']
+            raise ZabbixAPIException('Error {}: {}, {}'
+                    .format(error['code'], error['message'],
+                            error.get('data', 'No data')),
+                    error['code'])
+        results[reply['id']] = reply['result']
+
+    try:
+        return [results[call['id']] for call in batch]
+    except KeyError as e:
+        raise ZabbixAPIException('No reply received for call id {}'
+                .format(e))